@@ -0,0 +1,28 @@
+from django.db import connections
+
+# 읽기/쓰기 연결 분리, settings.py에서 DATABASES['read']가 있을 때 DATABASE_ROUTERS에 등록된다
+# 읽기 쿼리는 query_only로 연 'read' 연결을 쓰고, 쓰기는 'default' 연결을 쓴다
+# WAL 모드에서는 'default'가 쓰는 동안에도 'read'가 마지막으로 커밋된 내용을 읽을 수 있다
+#
+# 'default'에서 트랜잭션이 진행 중이면 읽기도 'default'에서 한다
+# (아직 커밋되지 않은 내용은 'read' 연결에서 보이지 않으므로 저장 후 바로 다시 읽는 코드가 틀린 값을 받는다)
+
+READ_ALIAS = 'read'
+WRITE_ALIAS = 'default'
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if connections[WRITE_ALIAS].in_atomic_block:
+            return WRITE_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return WRITE_ALIAS
+
+    # 두 연결은 같은 DB 파일을 쓴다
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITE_ALIAS
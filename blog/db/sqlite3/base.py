@@ -0,0 +1,63 @@
+from django.db.backends.sqlite3 import base
+
+# SQLite 운영용 설정을 더한 DB 백엔드, settings.py DATABASES의 ENGINE에 'blog.db.sqlite3'로 지정한다
+# 연결할 때마다 PRAGMA를 실행한다
+#   journal_mode=WAL   : 쓰는 동안에도 다른 연결이 읽을 수 있다(기본 rollback journal은 커밋하는 동안 읽기가 막힌다)
+#   synchronous=NORMAL : WAL에서는 커밋마다 fsync 하지 않아도 DB가 깨지지 않는다
+#   busy_timeout       : 다른 연결이 쓰고 있으면 바로 'database is locked' 에러를 내지 않고 기다린다
+#   mmap_size, cache_size : 자주 읽는 페이지를 메모리에 둔다
+#
+# OPTIONS
+#   'pragmas'          : PRAGMA 값을 바꾸거나 더한다, 예) {'cache_size': -64000}
+#   'read_only'        : True이면 query_only=ON, 읽기 전용 연결(blog/db/routers.py)
+#   'transaction_mode' : 트랜잭션 시작 방법, 기본 'IMMEDIATE'
+#                        처음부터 쓰기 잠금을 잡아서 읽다가 쓰기로 바뀔 때 busy_timeout을 무시하고 실패하는 것을 막는다
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(conn, pragmas):
+    cursor = conn.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        # sqlite3.connect()가 모르는 옵션은 빼고 넘긴다
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+        self.read_only = options.get('read_only', False)
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE')
+        kwargs = super().get_connection_params()
+        for key in ('pragmas', 'read_only', 'transaction_mode'):
+            kwargs.pop(key, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = dict(self.pragmas)
+        # 메모리 DB(테스트)에는 WAL을 쓸 수 없다
+        if self.is_in_memory_db():
+            pragmas.pop('journal_mode', None)
+        if self.read_only:
+            # 읽기 전용 연결은 journal_mode를 바꾸지 않는다(쓰기 잠금이 필요하다)
+            pragmas.pop('journal_mode', None)
+            pragmas['query_only'] = 'ON'
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.read_only or not self.transaction_mode:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
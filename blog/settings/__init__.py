@@ -0,0 +1,8 @@
+import os
+
+# BLOG_ENV=production 이면 운영 설정, 없으면 개발 설정을 사용한다
+# 예) BLOG_ENV=production BLOG_SECRET_KEY=... BLOG_ALLOWED_HOSTS=example.com gunicorn blog.wsgi
+if os.environ.get('BLOG_ENV', 'development') == 'production':
+    from .production import *  # noqa
+else:
+    from .development import *  # noqa
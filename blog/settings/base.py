@@ -1,6 +1,9 @@
 """
 Django settings for blog project.
 
+개발/운영 환경에 공통인 설정, 환경별 설정은 development.py, production.py
+BLOG_ENV 환경 변수로 어떤 설정을 쓸지 고른다(blog/settings/__init__.py)
+
 Generated by 'django-admin startproject' using Django 3.1.7.
 
 For more information on this file, see
@@ -14,7 +17,8 @@ import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+# blog/settings/base.py 이므로 세 단계 위가 프로젝트 폴더
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 # Quick-start development settings - unsuitable for production
@@ -24,7 +28,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = '=lei0!laor8wc=yr2rfkzm)+xrd2^7_kw%=vf+$94%#y_8resd'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = False
 
 ALLOWED_HOSTS = []
 
@@ -43,9 +47,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'blog_app',
+    'blog_app.apps.BlogAppConfig',
     'single_pages_app',
-    'django_extensions',
+    # django_extensions는 개발용이므로 development.py에서 추가한다
     'django.contrib.sites',
 
     'crispy_forms',
@@ -58,7 +62,10 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.google', 
 ]
 
+# InstrumentationMiddleware : 요청마다 쿼리 수와 SQL/템플릿/마크다운 시간을 재서 Server-Timing 헤더에 넣는다
+# 다른 미들웨어의 쿼리(세션, 로그인 사용자)까지 재도록 맨 앞에 둔다, blog_app/instrumentation.py
 MIDDLEWARE = [
+    'blog_app.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,9 +77,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'blog.urls'
 
+# 템플릿 렌더링 시간을 재는 DjangoTemplates, blog_app/instrumentation.py
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'blog_app.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +89,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # 사이드바 카테고리 목록, blog_app/context_processors.py
+                'blog_app.context_processors.sidebar',
             ],
         },
     },
@@ -92,13 +102,45 @@ WSGI_APPLICATION = 'blog.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# blog.db.sqlite3 : WAL, busy_timeout 등 PRAGMA를 설정하는 SQLite 백엔드, blog/db/sqlite3/base.py
+# CONN_MAX_AGE : 요청마다 연결을 새로 열지 않고 60초 동안 다시 쓴다
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'blog.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# BLOG_DB_READ_CONNECTION=1 이면 읽기 쿼리는 같은 DB 파일을 query_only로 연 'read' 연결을 사용한다, blog/db/routers.py
+# 테스트에서는 'default'와 같은 연결을 쓴다(MIRROR)
+if os.environ.get('BLOG_DB_READ_CONNECTION') == '1':
+    DATABASES['read'] = {
+        **DATABASES['default'],
+        'OPTIONS': {'read_only': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['blog.db.routers.ReadWriteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# search : 검색 결과 캐시, 1분 동안 최대 500개의 검색어를 저장하고 가장 오래 쓰이지 않은 것부터 지운다(LRU)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-search',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 500,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -140,6 +182,42 @@ STATIC_URL = '/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, '_media')
+
+# ASGI 서버로 실행할 때 True, 목록/상세/검색/랜딩 페이지가 비동기 뷰(blog_app/async_views.py)를 사용한다
+# 예) BLOG_ASYNC_VIEWS=1 uvicorn blog.asgi:application --workers 4
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
+# 비동기 뷰에서 서로 관계없는 쿼리를 여러 스레드에서 동시에 실행한다
+BLOG_ASYNC_PARALLEL_QUERIES = True
+
+# 첨부 파일 다운로드(blog_app/downloads.py)를 앞단 웹 서버에 맡길 때 설정
+# None : 장고가 직접 보낸다, 'x-sendfile' : Apache/lighttpd, 'x-accel-redirect' : nginx
+BLOG_SENDFILE = None
+# nginx의 internal location 경로, 예) location /protected-media/ { internal; alias /path/to/_media/; }
+BLOG_SENDFILE_URL = '/protected-media/'
+
+# 이 시간(ms)보다 오래 걸렸거나 이 수보다 쿼리가 많은 요청은 'blog_app.slow_requests' 로거에 남긴다
+BLOG_SLOW_REQUEST_MS = int(os.environ.get('BLOG_SLOW_REQUEST_MS', 500))
+BLOG_SLOW_REQUEST_QUERIES = int(os.environ.get('BLOG_SLOW_REQUEST_QUERIES', 50))
+# 응답에 Server-Timing 헤더를 넣는다
+BLOG_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'blog_app.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 # 소셜 로그인 기능, urls.py 설정
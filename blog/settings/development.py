@@ -0,0 +1,10 @@
+from .base import *  # noqa
+
+# 개발 설정, python manage.py runserver
+
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+# pip install django_extensions, django shell+
+INSTALLED_APPS = INSTALLED_APPS + ['django_extensions']
@@ -0,0 +1,58 @@
+import os
+from django.core.exceptions import ImproperlyConfigured
+from .base import *  # noqa
+
+# 운영 설정, BLOG_ENV=production 일 때 사용한다
+#   BLOG_SECRET_KEY      : 필수
+#   BLOG_ALLOWED_HOSTS   : 쉼표로 구분한 도메인, 예) example.com,www.example.com
+#   BLOG_CONN_MAX_AGE    : DB 연결을 다시 쓰는 시간(초), 기본 600
+#   BLOG_CACHE_BACKEND   : 캐시 백엔드, 기본 파일 캐시
+#   BLOG_CACHE_LOCATION  : 캐시 위치, 파일 캐시면 폴더, memcached면 '127.0.0.1:11211'
+#   BLOG_SLOW_LOG        : 느린 요청 로그(JSON 한 줄씩)를 남길 파일, 없으면 콘솔(stderr)
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('BLOG_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('BLOG_ENV=production 에서는 BLOG_SECRET_KEY 환경 변수가 필요합니다')
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('BLOG_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# 요청마다 DB에 새로 연결하지 않는다
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('BLOG_CONN_MAX_AGE', 600))
+if 'read' in DATABASES:
+    DATABASES['read']['CONN_MAX_AGE'] = DATABASES['default']['CONN_MAX_AGE']
+
+# 템플릿을 한 번만 읽고 컴파일한 결과를 프로세스가 끝날 때까지 다시 쓴다
+# loaders를 직접 지정하므로 APP_DIRS는 쓸 수 없다
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# 페이지, 조각, 사이드바 캐시와 무효화 버전(page_cache.py, fragments.py)은 모든 워커 프로세스가 같이 봐야 하므로
+# 프로세스마다 따로인 LocMemCache 대신 공유되는 캐시를 쓴다
+# 검색 결과 캐시('search')는 TIMEOUT이 짧으므로 base.py의 LocMemCache를 그대로 쓴다
+CACHES['default'] = {
+    'BACKEND': os.environ.get('BLOG_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+    'LOCATION': os.environ.get('BLOG_CACHE_LOCATION', str(BASE_DIR / '_cache')),
+}
+
+STATIC_ROOT = BASE_DIR / '_static'
+
+# HTTPS 뒤에서 실행할 때 BLOG_HTTPS=1
+if os.environ.get('BLOG_HTTPS') == '1':
+    SESSION_COOKIE_SECURE = True
+    CSRF_COOKIE_SECURE = True
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+# logrotate가 파일을 옮겨도 이어서 쓰도록 WatchedFileHandler를 쓴다
+if os.environ.get('BLOG_SLOW_LOG'):
+    LOGGING['handlers']['slow_log'] = {
+        'class': 'logging.handlers.WatchedFileHandler',
+        'filename': os.environ['BLOG_SLOW_LOG'],
+    }
+    LOGGING['loggers']['blog_app.slow_requests']['handlers'] = ['slow_log']
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Category, Tag, Comment
+from .models import Post, Category, Tag, Comment, Job
 from markdownx.admin import MarkdownxModelAdmin
 
 # Register your models here.
@@ -14,4 +14,12 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = { 'slug' : ('name', )}
 
 admin.site.register(Category, CategoryAdmin)
-admin.site.register(Tag, TagAdmin)
\ No newline at end of file
+admin.site.register(Tag, TagAdmin)
+
+# 작업 큐의 상태 확인, 실패한 작업은 status를 pending으로 바꾸면 다시 실행된다
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'kwargs', 'status', 'attempts', 'max_attempts', 'run_after', 'modified_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'created_at', 'modified_at')
+
+admin.site.register(Job, JobAdmin)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class BlogAppConfig(AppConfig):
     name = 'blog_app'
+
+    def ready(self):
+        # 시그널 연결
+        from . import signals
+        # 작업 큐에서 실행할 작업 등록
+        from . import tasks
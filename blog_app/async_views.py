@@ -0,0 +1,126 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import render, get_object_or_404
+from django.utils.functional import SimpleLazyObject
+from .models import Post, Category, Tag
+from .forms import CommentForm
+from .context_processors import get_sidebar
+from .fragments import FRAGMENT_TIMEOUT, get_fragment_versions
+from .pagination import SequencePaginator
+from .search import search_posts, get_hit_count_label
+from .views import PostList, PostSearch, paginate_post_list, paginate_comments, get_search_posts
+
+# ASGI 서버(uvicorn 등)에서 쓰는 비동기 뷰, settings.BLOG_ASYNC_VIEWS = True 이면 urls.py가 views.py 대신 사용한다
+# 장고 3.2의 ORM은 비동기를 지원하지 않으므로 서로 관계없는 쿼리(목록, 사이드바, 로그인 사용자 등)를
+# 각각 스레드에서 동시에 실행하고 모두 끝나면 템플릿을 렌더링한다
+# 쿼리를 기다리는 동안 이벤트 루프는 다른 요청을 처리하므로 요청마다 스레드를 하나씩 붙잡고 있지 않는다
+#
+# settings.BLOG_ASYNC_PARALLEL_QUERIES = False 이면 쿼리를 한 스레드에서 차례로 실행한다
+# (테스트처럼 모든 쿼리가 하나의 DB 연결과 트랜잭션을 써야 하는 경우)
+
+
+def run_in_thread(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # 요청이 끝날 때 닫히는 연결은 요청을 처리한 스레드의 연결뿐이므로 작업 스레드의 연결은 여기서 정리한다
+            close_old_connections()
+    return run
+
+
+# 함수들을 동시에 실행하고 결과를 순서대로 return
+async def run_queries(*funcs):
+    if getattr(settings, 'BLOG_ASYNC_PARALLEL_QUERIES', True):
+        return await asyncio.gather(*(sync_to_async(run_in_thread(func), thread_sensitive=False)() for func in funcs))
+    return [await sync_to_async(func)() for func in funcs]
+
+
+# 템플릿에서 처음 쓸 때 쿼리하던 로그인 사용자를 미리 불러온다
+def load_user(request):
+    return request.user.is_authenticated
+
+
+# 렌더링 중에도 지연 평가되는 값(작성자 아바타 등)이 쿼리할 수 있으므로 스레드에서 렌더링한다
+async def render_async(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def post_list(request):
+    queryset = Post.objects.for_listing()
+    page, sidebar, _ = await run_queries(
+        lambda: paginate_post_list(request, queryset),
+        get_sidebar,
+        lambda: load_user(request),
+    )
+    return await render_async(request, PostList.template_name, {**page, **sidebar})
+
+
+async def category_page(request, slug):
+    if slug == 'no_category':
+        page, sidebar, _ = await run_queries(
+            lambda: paginate_post_list(request, Post.objects.for_listing().filter(category=None)),
+            get_sidebar,
+            lambda: load_user(request),
+        )
+        category = '미분류'
+    else:
+        # 카테고리를 먼저 가져오지 않고 slug로 포스트를 거르면 두 쿼리를 동시에 할 수 있다
+        category, page, sidebar, _ = await run_queries(
+            lambda: get_object_or_404(Category, slug=slug),
+            lambda: paginate_post_list(request, Post.objects.for_listing().filter(category__slug=slug)),
+            get_sidebar,
+            lambda: load_user(request),
+        )
+    return await render_async(request, PostList.template_name, {**page, **sidebar, 'category': category})
+
+
+async def tag_page(request, slug):
+    tag, page, sidebar, _ = await run_queries(
+        lambda: get_object_or_404(Tag, slug=slug),
+        lambda: paginate_post_list(request, Post.objects.for_listing().filter(tags__slug=slug)),
+        get_sidebar,
+        lambda: load_user(request),
+    )
+    return await render_async(request, PostList.template_name, {**page, **sidebar, 'tag': tag})
+
+
+async def post_detail(request, pk):
+    post, versions, sidebar, _ = await run_queries(
+        lambda: get_object_or_404(Post.objects.select_related('author', 'category'), pk=pk),
+        lambda: get_fragment_versions(pk),
+        get_sidebar,
+        lambda: load_user(request),
+    )
+    context = {
+        'post': post,
+        'object': post,
+        'comment_form': CommentForm,
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'fragment_versions': versions,
+        # 댓글 조각이 캐시되어 있으면 댓글 쿼리를 하지 않도록 PostDetail처럼 템플릿에서 처음 쓸 때 가져온다
+        'comment_page': SimpleLazyObject(lambda: paginate_comments(request, post, first_page=True)['comment_page']),
+        **sidebar,
+    }
+    return await render_async(request, 'blog/post_detail.html', context)
+
+
+async def post_search(request, q):
+    hits, sidebar, _ = await run_queries(
+        lambda: search_posts(q),
+        get_sidebar,
+        lambda: load_user(request),
+    )
+    paginator = SequencePaginator(hits, PostSearch.paginate_by)
+    page = paginator.get_page(request.GET.get(paginator.cursor_param))
+    [page.object_list] = await run_queries(lambda: get_search_posts(page.object_list))
+    context = {
+        'post_list': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'search_info': f'Search: {q} ({get_hit_count_label(hits)})',
+        **sidebar,
+    }
+    return await render_async(request, PostSearch.template_name, context)
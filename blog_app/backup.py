@@ -0,0 +1,260 @@
+import datetime
+import gzip
+import io
+import json
+import sys
+from contextlib import contextmanager
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.color import no_style
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max, Q
+from .fragments import FRAGMENT_PARTS, bump_fragment_versions
+from .models import Post, Category, Tag, Comment
+
+# export_blog / import_blog 명령에서 쓰는 NDJSON(한 줄에 JSON 하나) 백업 형식
+#   {"model": "blog", "version": 1}
+#   {"model": "user", "username": ...}
+#   {"model": "category", "name": ..., "slug": ...}
+#   {"model": "tag", "name": ..., "slug": ...}
+#   {"model": "post", "pk": ..., "category": slug, "author": username, "tags": [slug, ...], "head_image": 파일 이름, ...}
+#   {"model": "comment", "pk": ..., "post": 포스트 pk, "author": username, ...}
+#
+# 내보낼 때는 pk 순서로 잘라서 읽고 한 줄씩 쓰며, 가져올 때는 한 줄씩 읽어서 batch_size만큼 모이면
+# bulk_create로 저장하고 커밋한다, 데이터 양과 상관없이 메모리 사용량이 일정하다
+# 사용자, 카테고리, 태그는 username과 slug로 찾아서 이미 있으면 그대로 쓴다(비밀번호는 내보내지 않는다)
+# 업로드 파일은 저장소의 이름만 옮긴다, 파일(_media)은 따로 복사해야 한다
+# 시그널을 거치지 않으므로 저장한 포스트의 조각 캐시 버전(fragments.py)을 배치마다 직접 바꾼다
+# 같은 pk의 포스트가 전에 있었다면(빈 DB에 다시 가져오는 경우 등) 그 포스트의 조각이 남아 있을 수 있다
+
+FORMAT_VERSION = 1
+POST_FIELDS = (
+    'title', 'hook_text', 'content', 'content_html', 'content_hash', 'excerpt',
+    'head_image_renditions', 'file_upload_sha256',
+)
+POST_TIMESTAMPS = ('created_at', 'update_at')
+COMMENT_TIMESTAMPS = ('created_at', 'modified_at')
+
+
+def open_ndjson(path, mode):
+    # '-'는 표준 입력, 표준 출력은 명령의 self.stdout을 쓴다
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# 큰 테이블을 pk 순서로 batch_size개씩 잘라서 dict로 읽는다, 모델 객체를 만들지 않으므로 빠르다
+def iter_batches(queryset, batch_size, *fields):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').values('pk', *fields)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]['pk']
+
+
+def iter_records(batch_size=1000):
+    yield {'model': 'blog', 'version': FORMAT_VERSION}
+    # 포스트나 댓글을 쓴 사용자만
+    users = User.objects.filter(
+        Q(pk__in=Post.objects.values('author')) | Q(pk__in=Comment.objects.values('author'))
+    ).order_by('pk').values('username', 'email', 'first_name', 'last_name')
+    for user in users.iterator():
+        yield {'model': 'user', **user}
+    for category in Category.objects.order_by('pk').values('name', 'slug').iterator():
+        yield {'model': 'category', **category}
+    for tag in Tag.objects.order_by('pk').values('name', 'slug').iterator():
+        yield {'model': 'tag', **tag}
+
+    post_fields = POST_FIELDS + POST_TIMESTAMPS + ('category__slug', 'author__username', 'head_image', 'file_upload')
+    through = Post.tags.through
+    for batch in iter_batches(Post.objects.all(), batch_size, *post_fields):
+        # 한 배치의 태그는 쿼리 한 번으로 가져온다
+        tags = {}
+        for post_id, slug in through.objects.filter(
+            post_id__in=[post['pk'] for post in batch]
+        ).order_by('tag_id').values_list('post_id', 'tag__slug'):
+            tags.setdefault(post_id, []).append(slug)
+        for post in batch:
+            post['category'] = post.pop('category__slug')
+            post['author'] = post.pop('author__username')
+            post['tags'] = tags.get(post['pk'], [])
+            yield {'model': 'post', **post}
+
+    comment_fields = ('post', 'author__username', 'content') + COMMENT_TIMESTAMPS
+    for batch in iter_batches(Comment.objects.all(), batch_size, *comment_fields):
+        for comment in batch:
+            comment['author'] = comment.pop('author__username')
+            yield {'model': 'comment', **comment}
+
+
+# DjangoJSONEncoder는 시각을 밀리초까지만 쓰므로 마이크로초까지 그대로 쓴다
+class BackupJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_blog(f, batch_size=1000):
+    count = 0
+    encoder = BackupJSONEncoder(ensure_ascii=False)
+    for record in iter_records(batch_size):
+        f.write(encoder.encode(record) + '\n')
+        count += 1
+    return count
+
+
+# bulk_create는 auto_now, auto_now_add 필드를 지금 시각으로 덮어쓰므로 가져오는 동안에만 꺼둔다
+@contextmanager
+def keep_timestamps(*models):
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BlogImporter:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.users = {}
+        self.categories = {}
+        self.tags = {}
+        # model 이름과 저장하는 함수, 이 순서대로 저장한다
+        self.savers = {
+            'user': self.save_users,
+            'category': self.save_categories,
+            'tag': self.save_tags,
+            'post': self.save_posts,
+            'comment': self.save_comments,
+        }
+        self.pending = {model: [] for model in self.savers}
+        self.counts = {model: 0 for model in self.pending}
+        # 원래 pk에 더해서 새 pk를 만든다, 빈 DB에 가져오면 pk가 그대로 유지되고 댓글은 변환표 없이 포스트를 찾는다
+        self.post_offset = Post.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        self.comment_offset = Comment.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+
+    def run(self, lines):
+        current = None
+        with keep_timestamps(Post, Comment):
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                model = record.pop('model')
+                if model == 'blog':
+                    if record.get('version') != FORMAT_VERSION:
+                        raise ValueError(f'지원하지 않는 형식 버전입니다: {record.get("version")}')
+                    continue
+                if model not in self.pending:
+                    raise ValueError(f'{number}번째 줄: 알 수 없는 model {model}')
+                # 다음 model로 넘어가면 앞의 model(포스트가 참조하는 사용자, 카테고리, 태그 등)을 먼저 모두 저장한다
+                if model != current:
+                    self.flush(*self.models_before(model))
+                    current = model
+                self.pending[model].append(record)
+                if len(self.pending[model]) >= self.batch_size:
+                    self.flush(model)
+            self.flush(*self.pending)
+        self.reset_sequences()
+        return self.counts
+
+    # pk를 직접 넣었으므로 PostgreSQL 등의 시퀀스를 가장 큰 pk 다음으로 맞춘다(SQLite는 필요 없다)
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(no_style(), [User, Category, Tag, Post, Comment])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def models_before(self, model):
+        models = list(self.savers)
+        return models[:models.index(model)]
+
+    def flush(self, *models):
+        for model in models:
+            records = self.pending[model]
+            if not records:
+                continue
+            with transaction.atomic():
+                self.savers[model](records)
+            self.counts[model] += len(records)
+            self.pending[model] = []
+            # DEBUG=True이면 실행한 SQL이 connection.queries에 쌓이므로 비운다
+            reset_queries()
+
+    def save_users(self, records):
+        usernames = [record['username'] for record in records]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # 비밀번호는 옮기지 않으므로 로그인할 수 없는 사용자로 만든다, 비밀번호 찾기나 소셜 로그인으로 다시 로그인한다
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(password=password, **record) for record in records if record['username'] not in existing
+        ])
+        self.users.update(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    def save_named(self, model, cache, records):
+        slugs = [record['slug'] for record in records]
+        names = [record['name'] for record in records]
+        model.objects.bulk_create([model(name=record['name'], slug=record['slug']) for record in records], ignore_conflicts=True)
+        # 같은 이름의 다른 slug가 이미 있으면 그것을 쓴다
+        found = {}
+        for pk, name, slug in model.objects.filter(Q(slug__in=slugs) | Q(name__in=names)).values_list('pk', 'name', 'slug'):
+            found[slug] = found[name] = pk
+        for record in records:
+            cache[record['slug']] = found.get(record['slug']) or found[record['name']]
+
+    def save_categories(self, records):
+        self.save_named(Category, self.categories, records)
+
+    def save_tags(self, records):
+        self.save_named(Tag, self.tags, records)
+
+    def save_posts(self, records):
+        posts = []
+        links = []
+        for record in records:
+            post = Post(
+                pk=record['pk'] + self.post_offset,
+                category_id=self.categories[record['category']] if record['category'] else None,
+                author_id=self.users.get(record['author']),
+                head_image=record['head_image'],
+                file_upload=record['file_upload'],
+                **{field: record[field] for field in POST_FIELDS},
+            )
+            for field in POST_TIMESTAMPS:
+                setattr(post, field, datetime.datetime.fromisoformat(record[field]))
+            # 렌더링된 html이 없는(다른 곳에서 만든) 데이터는 여기서 렌더링한다
+            post.render_content()
+            posts.append(post)
+            links.extend(Post.tags.through(post_id=post.pk, tag_id=self.tags[slug]) for slug in record['tags'])
+        Post.objects.bulk_create(posts)
+        Post.tags.through.objects.bulk_create(links)
+        bump_fragment_versions([post.pk for post in posts], *FRAGMENT_PARTS)
+
+    def save_comments(self, records):
+        comments = []
+        for record in records:
+            comment = Comment(
+                pk=record['pk'] + self.comment_offset,
+                post_id=record['post'] + self.post_offset,
+                author_id=self.users[record['author']],
+                content=record['content'],
+            )
+            for field in COMMENT_TIMESTAMPS:
+                setattr(comment, field, datetime.datetime.fromisoformat(record[field]))
+            comments.append(comment)
+        Comment.objects.bulk_create(comments)
+        bump_fragment_versions({comment.post_id for comment in comments}, 'comments')
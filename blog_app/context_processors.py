@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+from .models import CategoryPostCount
+
+# base.html 사이드바(카테고리 목록, 미분류 포스트 수)를 모든 뷰에 같은 방법으로 넣어준다
+# settings.py TEMPLATES의 context_processors에 등록되어 있다
+
+SIDEBAR_CACHE_KEY = 'blog_app:sidebar'
+SIDEBAR_CACHE_TIMEOUT = 60 * 10
+
+
+def get_sidebar():
+    data = cache.get(SIDEBAR_CACHE_KEY)
+    if data is None:
+        categories, no_category_post_count = CategoryPostCount.sidebar()
+        data = {
+            'categories': categories,
+            'no_category_post_count': no_category_post_count,
+        }
+        cache.set(SIDEBAR_CACHE_KEY, data, SIDEBAR_CACHE_TIMEOUT)
+    return data
+
+
+# Category나 Post가 바뀌면 signals.py에서 호출
+# 커밋 전에 다른 요청이 이전 값을 다시 캐시할 수 있으므로 커밋 후에도 한 번 더 지운다
+def invalidate_sidebar():
+    cache.delete(SIDEBAR_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(SIDEBAR_CACHE_KEY))
+
+
+def sidebar(request):
+    # 사이드바가 없는 페이지에서는 캐시도 조회하지 않도록 템플릿에서 처음 쓸 때 가져온다
+    data = SimpleLazyObject(get_sidebar)
+    return {
+        'categories': SimpleLazyObject(lambda: data['categories']),
+        'no_category_post_count': SimpleLazyObject(lambda: data['no_category_post_count']),
+    }
@@ -0,0 +1,164 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# Post.file_upload, head_image 다운로드
+# 파일을 한 번에 메모리에 읽지 않고 FileResponse로 나눠서 보내고, Range 요청(이어받기, 동영상 탐색)에 206으로 답한다
+# ETag는 파일 내용의 sha256(아직 계산 전이면 크기와 수정 시각)이라 브라우저가 가진 파일이 같으면 304를 돌려준다
+#
+# settings.BLOG_SENDFILE을 지정하면 파일 전송은 앞단의 웹 서버에 맡기고 장고는 헤더만 보낸다
+#   'x-sendfile'       : Apache mod_xsendfile, lighttpd, X-Sendfile에 파일의 절대 경로
+#   'x-accel-redirect' : nginx, X-Accel-Redirect에 settings.BLOG_SENDFILE_URL + 파일 이름
+#                        (nginx에서 이 경로를 internal location으로 MEDIA_ROOT에 연결해야 한다)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+COMPRESSED_TYPES = {'bzip2': 'application/x-bzip', 'gzip': 'application/gzip', 'xz': 'application/x-xz'}
+
+
+# 파일의 start부터 length 바이트만 읽는 파일 객체, Range 요청에 사용
+class RangeFile:
+    def __init__(self, f, start, length):
+        self.f = f
+        self.remaining = length
+        f.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def get_content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return '{}; filename="{}"'.format(disposition, filename.replace('\\', '\\\\').replace('"', r'\"'))
+    except UnicodeEncodeError:
+        return "{}; filename*=utf-8''{}".format(disposition, quote(filename))
+
+
+def get_file_etag(size, modified, sha256=''):
+    if sha256:
+        return quote_etag(sha256)
+    return quote_etag(f'{size:x}-{int(modified.timestamp() * 1000000):x}')
+
+
+# Range 헤더를 (start, end) 로 바꾼다, Range가 없거나 여러 구간이면 None (전체를 보낸다)
+# 범위를 만족할 수 없으면 ValueError
+def parse_range(header, size):
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        if start >= size:
+            raise ValueError
+        if end and int(end) < start:
+            return None
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # bytes=-500 : 마지막 500 바이트
+        if int(end) == 0:
+            raise ValueError
+        start = max(size - int(end), 0)
+        end = size - 1
+    return start, end
+
+
+# If-Range의 ETag나 날짜가 지금 파일과 같을 때만 Range를 적용한다, 다르면 파일 전체를 보낸다
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, field_file, as_attachment=False, sha256=''):
+    storage = field_file.storage
+    name = field_file.name
+    filename = os.path.basename(name)
+    # DB에는 있지만 디스크에서 지워진 파일은 500이 아니라 404
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except OSError:
+        raise Http404('파일을 찾을 수 없습니다')
+    etag = get_file_etag(size, modified, sha256)
+    last_modified = int(modified.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        sendfile = getattr(settings, 'BLOG_SENDFILE', None)
+        if sendfile:
+            response = sendfile_response(sendfile, storage, name)
+        else:
+            response = file_response(request, storage, name, size, etag, last_modified)
+        if response.status_code == 416:
+            return response
+        content_type, encoding = mimetypes.guess_type(filename)
+        # 압축 파일(.gz 등)은 브라우저가 풀지 않도록 Content-Encoding이 아니라 Content-Type으로 보낸다
+        content_type = COMPRESSED_TYPES.get(encoding, content_type)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Content-Disposition'] = get_content_disposition(filename, as_attachment)
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 브라우저는 저장해두되 쓸 때마다 ETag로 확인한다
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def file_response(request, storage, name, size, etag, last_modified):
+    byte_range = None
+    if request.method == 'GET' and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    f = storage.open(name, 'rb')
+    if byte_range is None:
+        # 전체 파일은 열린 파일 그대로 넘겨서 WSGI 서버가 sendfile()로 보낼 수 있게 한다
+        response = FileResponse(f)
+        response.block_size = CHUNK_SIZE
+        response['Content-Length'] = size
+        return response
+    start, end = byte_range
+    response = FileResponse(RangeFile(f, start, end - start + 1), status=206)
+    response.block_size = CHUNK_SIZE
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+# 앞단 웹 서버가 파일을 보낸다, Range와 If-Range도 웹 서버가 처리한다
+def sendfile_response(sendfile, storage, name):
+    response = HttpResponse()
+    if sendfile == 'x-sendfile':
+        response['X-Sendfile'] = storage.path(name)
+    elif sendfile == 'x-accel-redirect':
+        prefix = getattr(settings, 'BLOG_SENDFILE_URL', '/protected-media/')
+        # 저장소의 이름과 실제 파일 위치가 다를 수 있으므로(storage.py) 실제 경로를 MEDIA_ROOT 기준으로 바꾼다
+        relative = os.path.relpath(storage.path(name), storage.location).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative)
+    else:
+        raise ValueError(f'지원하지 않는 BLOG_SENDFILE 값입니다: {sendfile}')
+    return response
@@ -0,0 +1,33 @@
+import uuid
+from django.core.cache import cache
+
+# 포스트 상세 페이지의 템플릿 조각 캐시 버전
+# post_detail.html은 본문(body), 태그(tags), 댓글(comments)을 각각 {% cache %}로 캐시하고
+# 캐시 키에 여기서 관리하는 버전을 넣는다. 포스트, 태그, 댓글이 바뀌면 signals.py에서 버전을 바꾸므로
+# 이전 조각은 더 이상 쓰이지 않고 TIMEOUT이 지나면 사라진다
+# 조각에는 사용자마다 다른 내용(수정 버튼, 댓글 폼)을 넣지 않으므로 모든 사용자가 같은 조각을 쓴다
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+FRAGMENT_PARTS = ('body', 'tags', 'comments')
+
+
+def get_version_key(post_pk, part):
+    return f'blog_app:post:{post_pk}:{part}:version'
+
+
+def get_fragment_versions(post_pk):
+    keys = {get_version_key(post_pk, part): part for part in FRAGMENT_PARTS}
+    versions = {keys[key]: value for key, value in cache.get_many(keys.keys()).items()}
+    # 버전이 캐시에서 사라졌다면 새 버전을 만든다, 이전 조각을 다시 쓰지 않도록 다른 값이어야 한다
+    missing = {key: uuid.uuid4().hex for key, part in keys.items() if part not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update({keys[key]: value for key, value in missing.items()})
+    return versions
+
+
+def bump_fragment_versions(post_pks, *parts):
+    cache.set_many({
+        get_version_key(post_pk, part): uuid.uuid4().hex
+        for post_pk in post_pks for part in parts
+    }, None)
@@ -0,0 +1,124 @@
+import io
+import os
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Post.head_image의 리사이즈 이미지(rendition)
+# 업로드한 원본은 그대로 두고 같은 폴더에 폭별, 형식별로 줄인 이미지를 만든다
+#   blog_app/images/2021/04/06/screenshot.png
+#   blog_app/images/2021/04/06/screenshot.card-400w.webp
+#   blog_app/images/2021/04/06/screenshot.card-800w.jpg ...
+# 만든 파일 목록(manifest)은 Post.head_image_renditions에 저장하고
+# 템플릿에서는 {% head_image post 'card' %} 태그로 srcset이 들어간 <picture>를 만든다
+#
+# 포스트를 저장할 때 이미지가 바뀌었다면 새로 만들고
+# 이전에 올린 이미지는 python manage.py build_head_images 로 만든다
+
+# ratio : 잘라낼 가로:세로 비율, None이면 원본 비율 그대로 줄인다
+# sizes : 화면 폭에 따라 이미지가 차지하는 폭, 브라우저가 srcset에서 어떤 폭을 받을지 고를 때 사용
+RENDITIONS = {
+    'card': {'widths': (400, 800, 1200), 'ratio': (4, 1), 'sizes': '(min-width: 992px) 730px, 100vw'},
+    'detail': {'widths': (400, 800, 1200), 'ratio': None, 'sizes': '(min-width: 992px) 730px, 100vw'},
+}
+
+# (manifest 키, Pillow 형식, 확장자, 저장 옵션)
+# WebP를 지원하지 않는 브라우저는 JPEG를 받는다
+FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def get_rendition_name(source_name, kind, width, ext):
+    stem, _ = os.path.splitext(source_name)
+    return f'{stem}.{kind}-{width}w.{ext}'
+
+
+def resize(image, width, ratio):
+    if ratio:
+        height = max(round(width * ratio[1] / ratio[0]), 1)
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, pil_format, options):
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG는 투명도가 없으므로 흰 배경 위에 붙인다
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+# head_image로 모든 rendition을 만들어 저장하고 manifest를 return
+# 이미지를 열 수 없으면 rendition 없이 source만 기록해서 템플릿이 원본을 쓰게 한다
+def build_renditions(field_file):
+    storage = field_file.storage
+    manifest = {'source': field_file.name}
+    try:
+        with storage.open(field_file.name, 'rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except OSError:
+        return manifest
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    manifest.update({'width': image.width, 'height': image.height})
+
+    for kind, spec in RENDITIONS.items():
+        # 원본보다 크게 늘리지는 않는다, 원본이 가장 작은 폭보다 좁으면 원본 폭으로 하나만 만든다
+        widths = [width for width in spec['widths'] if width <= image.width] or [image.width]
+        manifest[kind] = {}
+        for key, pil_format, ext, options in FORMATS:
+            files = []
+            for width in widths:
+                data = encode(resize(image, width, spec['ratio']), pil_format, options)
+                name = storage.save(get_rendition_name(field_file.name, kind, width, ext), ContentFile(data))
+                files.append([width, name])
+            manifest[kind][key] = files
+    return manifest
+
+
+# 원본 이미지에서 EXIF(촬영 위치 등), XMP, PNG 텍스트 같은 메타데이터를 지운다
+# 메타데이터가 없으면 파일을 건드리지 않는다, 저장된 파일 이름을 return
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def strip_metadata(field_file):
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+    except OSError:
+        return field_file.name
+    text = getattr(image, 'text', None) or {}
+    if image.format not in ('JPEG', 'PNG') or not (text or any(key in image.info for key in METADATA_KEYS)):
+        return field_file.name
+
+    # 색 정보(icc_profile)는 남긴다
+    options = {'exif': b''}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    rotated = image.getexif().get(0x0112, 1) != 1
+    if image.format == 'JPEG':
+        # 회전할 필요가 없으면 양자화 테이블을 그대로 써서 화질이 떨어지지 않게 한다
+        options['quality'] = 95 if rotated else 'keep'
+    output = ImageOps.exif_transpose(image) if rotated else image
+    output.info = {}
+    buffer = io.BytesIO()
+    output.save(buffer, image.format, **options)
+    storage.delete(field_file.name)
+    return storage.save(field_file.name, ContentFile(buffer.getvalue()))
+
+
+def delete_renditions(storage, manifest):
+    for kind in RENDITIONS:
+        for files in manifest.get(kind, {}).values():
+            for _, name in files:
+                storage.delete(name)
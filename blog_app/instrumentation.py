@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+# 요청마다 쿼리 수, SQL 시간, 템플릿 렌더링 시간, 마크다운 렌더링 시간을 잰다
+# 결과는 응답의 Server-Timing 헤더(브라우저 개발자 도구의 Timing 탭)에 넣고
+# 느린 요청이나 쿼리가 많은 요청(N+1)은 'blog_app.slow_requests' 로거에 JSON으로 남긴다
+#
+# settings.py
+#   MIDDLEWARE 맨 앞에 'blog_app.instrumentation.InstrumentationMiddleware'
+#   TEMPLATES의 BACKEND를 'blog_app.instrumentation.InstrumentedDjangoTemplates'
+#   BLOG_SLOW_REQUEST_MS      : 이 시간(ms)보다 오래 걸린 요청을 기록, 기본 500
+#   BLOG_SLOW_REQUEST_QUERIES : 이 수보다 쿼리가 많은 요청을 기록, 기본 50
+#   BLOG_SERVER_TIMING        : False이면 Server-Timing 헤더를 넣지 않는다
+
+logger = logging.getLogger('blog_app.slow_requests')
+
+# 로그에 남길 가장 느린 SQL 수
+WORST_SQL_COUNT = 5
+
+current_metrics = contextvars.ContextVar('blog_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.timings = Counter()
+        self.worst_sql = []
+        self.repeated_sql = Counter()
+        # 비동기 뷰는 여러 스레드에서 동시에 쿼리한다, async_views.py
+        self.lock = threading.Lock()
+
+    def add_query(self, sql, duration):
+        with self.lock:
+            self.queries += 1
+            self.sql_time += duration
+            self.repeated_sql[sql] += 1
+            item = (duration, sql)
+            if len(self.worst_sql) < WORST_SQL_COUNT:
+                heapq.heappush(self.worst_sql, item)
+            else:
+                heapq.heappushpop(self.worst_sql, item)
+
+    def add_timing(self, name, duration):
+        with self.lock:
+            self.timings[name] += duration
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def timer(name):
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - started)
+
+
+# 모든 DB 연결에 쿼리 시간을 재는 execute_wrapper를 붙인다, 요청 밖(관리 명령 등)에서는 그냥 실행한다
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+# 뷰가 렌더링하는 템플릿의 시간을 잰다, {% include %}나 inclusion tag는 바깥 템플릿 시간에 포함된다
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return self.template.render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def get_server_timing(metrics):
+    entries = [f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries"']
+    for name, duration in sorted(metrics.timings.items()):
+        entries.append(f'{name};dur={duration * 1000:.1f}')
+    entries.append(f'total;dur={metrics.total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def is_slow(metrics):
+    slow_ms = getattr(settings, 'BLOG_SLOW_REQUEST_MS', 500)
+    slow_queries = getattr(settings, 'BLOG_SLOW_REQUEST_QUERIES', 50)
+    return metrics.total * 1000 >= slow_ms or metrics.queries >= slow_queries
+
+
+def log_slow_request(request, response, metrics):
+    match = getattr(request, 'resolver_match', None)
+    record = {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(metrics.total * 1000, 1),
+        'queries': metrics.queries,
+        'sql_ms': round(metrics.sql_time * 1000, 1),
+        'timings_ms': {name: round(duration * 1000, 1) for name, duration in metrics.timings.items()},
+        'worst_sql': [
+            {'ms': round(duration * 1000, 2), 'sql': sql[:500]}
+            for duration, sql in sorted(metrics.worst_sql, reverse=True)
+        ],
+        # 같은 SQL이 여러 번 실행되었다면 N+1 쿼리일 가능성이 크다
+        'repeated_sql': [
+            {'count': count, 'sql': sql[:500]}
+            for sql, count in metrics.repeated_sql.most_common(3) if count > 1
+        ],
+    }
+    logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+# 동기(WSGI)와 비동기(ASGI) 모두 지원한다
+# 비동기로 실행할 때 동기 미들웨어가 맨 앞에 있으면 장고가 전체를 한 스레드에서 차례로 실행하므로
+# 비동기 뷰(async_views.py)가 동시에 처리되도록 __acall__로 기다린다
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # 장고가 이 미들웨어를 코루틴 함수로 알아보게 한다
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        # 응답을 만드는 데 걸린 시간만 잰다, 스트리밍 응답(파일 다운로드)의 전송 시간은 들어가지 않는다
+        request.metrics = metrics
+        if getattr(settings, 'BLOG_SERVER_TIMING', True):
+            response['Server-Timing'] = get_server_timing(metrics)
+        if is_slow(metrics):
+            log_slow_request(request, response, metrics)
+        return response
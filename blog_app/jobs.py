@@ -0,0 +1,84 @@
+import datetime
+import traceback
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+# 작업 큐(Job 모델)를 처리하는 부분
+# python manage.py run_jobs 가 대기 중인 작업을 하나씩 가져와서 등록된 함수를 실행한다
+# 작업 함수는 같은 작업이 두 번 실행되어도 결과가 같도록 만들어야 한다(실패 후 다시 시도, 중복으로 넣은 작업 등)
+#
+#   @register('post.file_checksum')
+#   def compute_file_checksum(post_pk):
+#       ...
+#
+#   Job.enqueue('post.file_checksum', post_pk=post.pk)
+
+tasks = {}
+
+# 실행 중인 채로 이 시간이 지난 작업은 워커가 죽은 것으로 보고 다시 가져간다
+STALE_AFTER = datetime.timedelta(minutes=10)
+
+
+def register(name):
+    def decorator(func):
+        tasks[name] = func
+        return func
+    return decorator
+
+
+# 실패한 횟수에 따라 10초, 20초, 40초... 뒤에 다시 시도
+def get_retry_delay(attempts):
+    return datetime.timedelta(seconds=10 * 2 ** max(attempts - 1, 0))
+
+
+# 실행할 작업 하나를 가져와서 RUNNING으로 바꾼다
+# 워커가 여러 개여도 status가 바뀌지 않은 경우에만 update 되므로 같은 작업을 두 워커가 가져가지 않는다
+def claim_next_job():
+    while True:
+        now = timezone.now()
+        ready = Q(status=Job.PENDING, run_after__lte=now) | Q(status=Job.RUNNING, locked_at__lt=now - STALE_AFTER)
+        job = Job.objects.filter(ready).order_by('run_after', 'pk').first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, locked_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    task = tasks.get(job.name)
+    try:
+        if task is None:
+            raise LookupError(f'등록되지 않은 작업입니다: {job.name}')
+        # 작업에서 바꾼 내용은 모두 저장되거나 모두 취소된다
+        with transaction.atomic():
+            task(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts and task is not None:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + get_retry_delay(job.attempts)
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_after', 'last_error', 'locked_at', 'modified_at'])
+    return job
+
+
+# 지금 실행할 수 있는 작업을 모두(최대 limit개) 처리하고 처리한 작업 리스트를 return
+def run_pending_jobs(limit=None):
+    done = []
+    while limit is None or len(done) < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        done.append(run_job(job))
+    return done
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand
+from blog.db.sqlite3.base import DEFAULT_PRAGMAS, apply_pragmas
+
+# python manage.py benchmark_sqlite
+# 쓰는 연결이 있을 때 읽는 연결이 얼마나 기다리는지 기본 rollback journal과 WAL(blog/db/sqlite3)에서 비교한다
+# 임시 폴더에 벤치마크용 DB를 따로 만들어서 사용하므로 실제 DB는 건드리지 않는다
+#
+# 읽기 스레드 : 목록 페이지처럼 최근 포스트와 댓글 수를 계속 조회한다
+# 쓰기 스레드 : 댓글을 여러 개 저장하는 트랜잭션을 계속 커밋한다
+
+MODES = {
+    'rollback': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': DEFAULT_PRAGMAS['busy_timeout']},
+    'wal': DEFAULT_PRAGMAS,
+}
+
+READ_SQL = (
+    'SELECT p.id, p.title, (SELECT COUNT(*) FROM bench_comment c WHERE c.post_id = p.id) '
+    'FROM bench_post p ORDER BY p.id DESC LIMIT 5'
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare reader latency under concurrent writes with rollback journal vs WAL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=3.0, help='seconds per mode')
+        parser.add_argument('--comments-per-write', type=int, default=200)
+        parser.add_argument('--modes', default='rollback,wal')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"mode":<10}{"reads":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}{"errors":>8}{"writes":>8}')
+        for mode in options['modes'].split(','):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                result = self.run_mode(os.path.join(tmp_dir, 'bench.sqlite3'), MODES[mode], options)
+            latencies = sorted(result['latencies']) or [0.0]
+            self.stdout.write(
+                f'{mode:<10}{len(result["latencies"]):>8}'
+                f'{statistics.median(latencies):>10.2f}{percentile(latencies, 95):>10.2f}'
+                f'{percentile(latencies, 99):>10.2f}{latencies[-1]:>10.2f}'
+                f'{result["errors"]:>8}{result["writes"]:>8}'
+            )
+
+    def connect(self, path, pragmas):
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    def setup_db(self, path, pragmas):
+        conn = self.connect(path, pragmas)
+        conn.execute('CREATE TABLE bench_post (id INTEGER PRIMARY KEY, title TEXT, content TEXT)')
+        conn.execute('CREATE TABLE bench_comment (id INTEGER PRIMARY KEY, post_id INTEGER, content TEXT)')
+        conn.execute('CREATE INDEX bench_comment_post ON bench_comment (post_id)')
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO bench_post (title, content) VALUES (?, ?)', [
+            (f'post {i}', 'x' * 2000) for i in range(500)
+        ])
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run_mode(self, path, pragmas, options):
+        self.setup_db(path, pragmas)
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'latencies': [], 'errors': 0, 'writes': 0}
+
+        def reader():
+            conn = self.connect(path, pragmas)
+            latencies = []
+            errors = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute(READ_SQL).fetchall()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+            conn.close()
+            with lock:
+                result['latencies'].extend(latencies)
+                result['errors'] += errors
+
+        def writer():
+            conn = self.connect(path, pragmas)
+            post_id = 1
+            while not stop.is_set():
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany('INSERT INTO bench_comment (post_id, content) VALUES (?, ?)', [
+                        (post_id, 'y' * 1000) for _ in range(options['comments_per_write'])
+                    ])
+                    conn.execute('COMMIT')
+                    result['writes'] += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    with lock:
+                        result['errors'] += 1
+                post_id = post_id % 500 + 1
+            conn.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return result
+
+
+def percentile(values, p):
+    index = min(int(len(values) * p / 100), len(values) - 1)
+    return values[index]
@@ -0,0 +1,159 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.utils import timezone
+from blog_app.models import Post, Category, Tag
+from .benchmark_sqlite import percentile
+
+# python manage.py benchmark_views --output bench.json
+# python manage.py benchmark_views --baseline bench.json
+# 목록, 상세, 카테고리, 태그, 검색, 랜딩 페이지를 test Client로 여러 번 요청해서
+# 응답 시간(p50, p95, 최대), 쿼리 수와 SQL 시간(instrumentation.py), 메모리 할당(tracemalloc)을 잰다
+#
+# 먼저 generate_blog_data로 데이터를 만들고, 운영과 같은 조건으로 재려면 BLOG_ENV=production 으로 실행한다
+# 기본은 요청마다 캐시(페이지, 조각, 사이드바)를 비우고 재는 cold, --warm이면 캐시를 그대로 둔다
+#
+# --baseline : 이전 결과 JSON과 비교해서 p50이 --threshold(비율)보다 느려졌거나
+#              쿼리 수가 늘어난 페이지가 있으면 실패한다(종료 코드 1)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot blog pages and optionally compare with a baseline JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--warm', action='store_true', help='keep caches between requests')
+        parser.add_argument('--search', default='django')
+        parser.add_argument('--output', help='write results as JSON to this file')
+        parser.add_argument('--baseline', help='compare with a previous JSON result')
+        parser.add_argument('--threshold', type=float, default=0.25, help='allowed p50 slowdown, 0.25 = 25%%')
+        parser.add_argument('--query-threshold', type=int, default=0, help='allowed extra queries')
+
+    def get_urls(self, search):
+        post = Post.objects.annotate(n=Count('comment')).order_by('-n', '-pk').first()
+        category = Category.objects.annotate(n=Count('post')).order_by('-n', 'pk').first()
+        tag = Tag.objects.annotate(n=Count('post')).order_by('-n', 'pk').first()
+        if post is None or category is None or tag is None:
+            raise CommandError('포스트, 카테고리, 태그가 필요합니다, 먼저 python manage.py generate_blog_data 를 실행하세요')
+        return {
+            'landing': '/',
+            'post_list': '/blog/',
+            # 댓글이 가장 많은 포스트
+            'post_detail': post.get_absolute_url(),
+            'category_page': category.get_absolute_url(),
+            'no_category_page': '/blog/category/no_category/',
+            'tag_page': tag.get_absolute_url(),
+            'search': f'/blog/search/{search}/',
+        }
+
+    def clear_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def request(self, client, url, warm):
+        if not warm:
+            self.clear_caches()
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f'{url} : {response.status_code}')
+        return elapsed, getattr(response.wsgi_request, 'metrics', None)
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.request(client, url, options['warm'])
+        latencies = []
+        for _ in range(options['iterations']):
+            elapsed, metrics = self.request(client, url, options['warm'])
+            latencies.append(elapsed)
+        latencies.sort()
+
+        # 메모리 할당은 tracemalloc이 요청을 느리게 하므로 한 번 더 요청해서 따로 잰다
+        if not options['warm']:
+            self.clear_caches()
+        tracemalloc.start()
+        client.get(url)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'url': url,
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'max_ms': round(latencies[-1], 2),
+            'mean_ms': round(statistics.mean(latencies), 2),
+            # 마지막 요청의 쿼리 수, 같은 조건이면 요청마다 같다
+            'queries': metrics.queries if metrics else None,
+            'sql_ms': round(metrics.sql_time * 1000, 2) if metrics else None,
+            'alloc_peak_kb': round(peak / 1024, 1),
+            'alloc_retained_kb': round(current / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations는 1 이상이어야 합니다')
+        urls = self.get_urls(options['search'])
+        # test Client의 Host(testserver)를 허용한다
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            client = Client()
+            results = {name: self.measure(client, url, options) for name, url in urls.items()}
+
+        self.stdout.write(f'{"page":<18}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}{"queries":>9}{"sql ms":>9}{"peak KB":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18}{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{result["max_ms"]:>10.2f}'
+                f'{result["queries"] if result["queries"] is not None else "-":>9}'
+                f'{result["sql_ms"] if result["sql_ms"] is not None else "-":>9}{result["alloc_peak_kb"]:>10.1f}'
+            )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'settings': settings.SETTINGS_MODULE,
+            'dataset': {
+                'posts': Post.objects.count(),
+                'categories': Category.objects.count(),
+                'tags': Tag.objects.count(),
+            },
+            'options': {key: options[key] for key in ('iterations', 'warmup', 'warm', 'search')},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'results written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = get_regressions(baseline['results'], results, options['threshold'], options['query_threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'no regressions against {options["baseline"]}'))
+
+
+# 기준 결과보다 느려졌거나 쿼리가 늘어난 페이지의 설명 목록
+def get_regressions(baseline, results, threshold, query_threshold=0):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['p50_ms'] > base['p50_ms'] * (1 + threshold):
+            regressions.append(f'{name}: p50 {base["p50_ms"]}ms -> {result["p50_ms"]}ms')
+        if None not in (result['queries'], base['queries']) and result['queries'] > base['queries'] + query_threshold:
+            regressions.append(f'{name}: queries {base["queries"]} -> {result["queries"]}')
+    return regressions
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from blog_app.models import Post
+from blog_app.fragments import bump_fragment_versions
+from blog_app.page_cache import bump_content_state
+
+# python manage.py build_head_images
+# 리사이즈 이미지가 없거나 head_image와 맞지 않는 포스트의 리사이즈 이미지를 만든다, blog_app/images.py
+class Command(BaseCommand):
+    help = 'Build resized WebP/JPEG renditions of Post.head_image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='rebuild renditions even if the manifest matches')
+
+    def handle(self, *args, **options):
+        built = []
+        posts = Post.objects.exclude(head_image='').only('pk', 'head_image', 'head_image_renditions').order_by('pk')
+        for post in posts.iterator():
+            if post.update_head_image_renditions(force=options['force']):
+                built.append(post.pk)
+        # update()로 저장해서 시그널이 발생하지 않으므로 캐시된 페이지를 직접 무효화한다
+        if built:
+            bump_fragment_versions(built, 'body')
+            bump_content_state()
+        self.stdout.write(self.style.SUCCESS(f'{len(built)} post(s) processed'))
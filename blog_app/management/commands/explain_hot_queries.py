@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from blog_app.models import Post, Category, Tag, Comment
+from blog_app.views import PostList, COMMENTS_PER_PAGE
+
+# python manage.py explain_hot_queries
+# 목록, 카테고리, 미분류, 태그, 댓글, 태그 이름 조회 쿼리의 실행 계획(EXPLAIN)과 평균 실행 시간을 보여준다
+# SQLite에서 'SCAN'은 테이블(또는 인덱스) 전체를 읽는다는 뜻이고 'SEARCH ... USING INDEX'는 인덱스로 찾아간다는 뜻이다
+# generate_blog_data로 데이터를 만든 뒤 마이그레이션 전후에 실행해서 비교한다
+
+
+def get_hot_queries():
+    page = PostList.paginate_by + 1
+    category = Category.objects.annotate(n=Count('post')).order_by('-n', 'pk').first()
+    tag = Tag.objects.annotate(n=Count('post')).order_by('-n', 'pk').first()
+    post = Post.objects.annotate(n=Count('comment')).order_by('-n', 'pk').first()
+    tag_names = list(Tag.objects.values_list('name', flat=True)[:5])
+    # 목록 페이지와 같은 쿼리, 태그 prefetch는 따로 실행되므로 뺀다
+    posts = Post.objects.for_listing().prefetch_related(None)
+    return {
+        'post_list': posts.order_by('-pk')[:page],
+        'category_page': posts.filter(category=category).order_by('-pk')[:page],
+        'no_category_page': posts.filter(category=None).order_by('-pk')[:page],
+        'tag_page': posts.filter(tags=tag).order_by('-pk')[:page],
+        'comments': Comment.objects.filter(post=post).order_by('created_at', 'pk')[:COMMENTS_PER_PAGE + 1],
+        'tags_by_name': Tag.objects.filter(name__in=tag_names),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Show the query plans and timings of the hot blog queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        for name, queryset in get_hot_queries().items():
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) * 1000 / max(options['repeat'], 1)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({elapsed:.3f} ms)'))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'  {line}')
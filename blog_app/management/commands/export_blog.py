@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from blog_app.backup import export_blog, open_ndjson
+
+# python manage.py export_blog backup.ndjson.gz
+# 포스트, 카테고리, 태그, 댓글과 업로드 파일 이름을 NDJSON으로 내보낸다, blog_app/backup.py
+# 파일 이름이 .gz로 끝나면 gzip으로 압축하고 '-'이면 표준 출력으로 쓴다
+class Command(BaseCommand):
+    help = 'Stream posts, categories, tags and comments to a newline-delimited JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['path'] == '-':
+            export_blog(self.stdout, options['batch_size'])
+            return
+        with open_ndjson(options['path'], 'w') as f:
+            count = export_blog(f, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} record(s) exported in {time.perf_counter() - started:.1f}s'))
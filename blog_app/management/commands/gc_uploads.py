@@ -0,0 +1,52 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from blog_app.models import Post
+from blog_app.storage import TMP_DIR, get_upload_storage
+
+# python manage.py gc_uploads
+# 내용 주소 저장소(blog_app/storage.py)에서 어떤 포스트도 쓰지 않는 blob과 남은 임시 파일을 지운다
+# 업로드 중이거나 아직 커밋되지 않은 파일을 지우지 않도록 --min-age 보다 오래된 파일만 지운다
+class Command(BaseCommand):
+    help = 'Delete uploaded blobs that no post references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+        parser.add_argument('--min-age', type=int, default=60 * 60, help='only delete files older than this many seconds')
+
+    def handle(self, *args, **options):
+        storage = get_upload_storage()
+        referenced = set()
+        for head_image, file_upload, renditions in Post.objects.values_list('head_image', 'file_upload', 'head_image_renditions'):
+            for name in (head_image, file_upload):
+                if name:
+                    referenced.add(storage.get_blob_name(name))
+            for files in (renditions or {}).values():
+                if not isinstance(files, dict):
+                    continue
+                for items in files.values():
+                    referenced.update(storage.get_blob_name(name) for _, name in items)
+
+        cutoff = time.time() - options['min_age']
+        deleted = 0
+        freed = 0
+        for blob in storage.iter_blobs():
+            path = storage.path(blob)
+            if blob in referenced or os.path.getmtime(path) > cutoff:
+                continue
+            deleted += 1
+            freed += os.path.getsize(path)
+            if options['dry_run']:
+                self.stdout.write(f'would delete {blob}')
+            else:
+                storage.delete(blob)
+
+        tmp_dir = storage.path(TMP_DIR)
+        if os.path.isdir(tmp_dir) and not options['dry_run']:
+            for filename in os.listdir(tmp_dir):
+                path = os.path.join(tmp_dir, filename)
+                if os.path.getmtime(path) <= cutoff:
+                    os.remove(path)
+
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'{deleted} blob(s) {verb}, {freed} bytes'))
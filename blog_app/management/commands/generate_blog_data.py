@@ -0,0 +1,173 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils.text import slugify
+from blog_app.fragments import FRAGMENT_PARTS, bump_fragment_versions
+from blog_app.models import Post, Category, Tag, Comment
+from blog_app.page_cache import bump_content_state
+
+# python manage.py generate_blog_data --posts 5000
+# 벤치마크(benchmark_views)용 가짜 데이터를 만든다, --seed가 같으면 항상 같은 데이터가 만들어진다
+# 긴 마크다운 본문(제목, 목록, 코드 블록, 링크), 포스트마다 여러 개의 태그, 포스트마다 수가 크게 다른 댓글
+# (Comment에는 답글 관계가 없으므로 깊은 스레드 대신 몇몇 포스트에 댓글이 몰리도록 만든다)
+#
+# save()와 시그널을 거치지 않고 bulk_create로 저장하므로
+# 마크다운은 저장하기 전에 렌더링하고 카테고리 포스트 수와 검색 인덱스는 마지막에 다시 만든다
+# --clear 뒤에는 지운 포스트의 pk를 다시 쓰므로 배치마다 조각 캐시 버전(fragments.py)도 직접 바꾼다
+# 만든 데이터는 이름이 'bench'로 시작하고 --clear로 지울 수 있다
+
+PREFIX = 'bench'
+BATCH_SIZE = 500
+
+WORDS = (
+    'django python blog post model view template query index cache page list detail category tag search '
+    'comment author markdown image file upload server request response database sqlite migration test '
+    'benchmark latency memory thread async middleware session form admin static media url pattern slug '
+    'deploy nginx worker process signal transaction paginator cursor keyset fragment render context'
+).split()
+
+LANGS = ('python', 'bash', 'html', 'sql')
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic blog dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=300)
+        parser.add_argument('--tags-per-post', type=int, default=5)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--comments', type=int, default=10, help='average comments per post')
+        parser.add_argument('--paragraphs', type=int, default=20, help='markdown sections per post')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true', help='delete previously generated data first')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        started = time.perf_counter()
+        if options['clear']:
+            self.clear()
+
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            categories = self.create_categories(options['categories'])
+            tags = self.create_tags(options['tags'])
+        post_count = self.create_posts(options, users, categories, tags)
+        comment_count = self.create_comments(options, users)
+
+        call_command('recount_categories', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        bump_content_state()
+        self.stdout.write(self.style.SUCCESS(
+            f'{post_count} post(s), {comment_count} comment(s), {len(categories)} categories, {len(tags)} tags '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def clear(self):
+        with transaction.atomic():
+            Post.objects.filter(author__username__startswith=f'{PREFIX}_').delete()
+            Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+            Tag.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+            User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+
+    def create_users(self, count):
+        existing = set(User.objects.filter(username__startswith=f'{PREFIX}_').values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}_user_{i}')
+            for i in range(count) if f'{PREFIX}_user_{i}' not in existing
+        ])
+        return list(User.objects.filter(username__startswith=f'{PREFIX}_').order_by('pk')[:count])
+
+    def create_categories(self, count):
+        return self.create_named(Category, count, 'category')
+
+    def create_tags(self, count):
+        return self.create_named(Tag, count, 'tag')
+
+    def create_named(self, model, count, kind):
+        names = [f'{PREFIX}-{kind}-{i}-{WORDS[i % len(WORDS)]}' for i in range(count)]
+        existing = set(model.objects.filter(slug__in=names).values_list('slug', flat=True))
+        model.objects.bulk_create([model(name=name, slug=slugify(name)) for name in names if name not in existing])
+        return list(model.objects.filter(slug__in=names).order_by('pk'))
+
+    def words(self, count):
+        return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def markdown(self, paragraphs):
+        parts = []
+        for i in range(paragraphs):
+            parts.append(f'## {self.words(4).capitalize()}')
+            parts.append(self.words(self.random.randint(40, 120)).capitalize() + '.')
+            choice = i % 4
+            if choice == 0:
+                parts.append('\n'.join(f'- {self.words(6)} **{self.random.choice(WORDS)}**' for _ in range(5)))
+            elif choice == 1:
+                lang = self.random.choice(LANGS)
+                code = '\n'.join(f'{self.random.choice(WORDS)} = "{self.words(3)}"' for _ in range(8))
+                parts.append(f'```{lang}\n{code}\n```')
+            elif choice == 2:
+                parts.append(f'> {self.words(20)} [{self.random.choice(WORDS)}](https://example.com/{i})')
+        return '\n\n'.join(parts)
+
+    # 앞쪽 포스트일수록 태그, 카테고리가 더 자주 쓰이도록(실제 블로그처럼 몇몇에 몰리도록) 고른다
+    def pick(self, items):
+        return items[min(int(self.random.paretovariate(1.2)) - 1, len(items) - 1)]
+
+    def create_posts(self, options, users, categories, tags):
+        created = 0
+        through = Post.tags.through
+        while created < options['posts']:
+            size = min(BATCH_SIZE, options['posts'] - created)
+            posts = []
+            for i in range(size):
+                post = Post(
+                    title=self.words(3)[:30],
+                    hook_text=self.words(8)[:100],
+                    content=self.markdown(options['paragraphs']),
+                    author=self.random.choice(users),
+                    # 10%는 미분류
+                    category=self.pick(categories) if categories and self.random.random() > 0.1 else None,
+                )
+                post.render_content()
+                posts.append(post)
+            with transaction.atomic():
+                # SQLite에서는 bulk_create가 pk를 돌려주지 않으므로 태그를 연결할 수 있도록 pk를 직접 정한다
+                next_pk = (Post.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0) + 1
+                for offset, post in enumerate(posts):
+                    post.pk = next_pk + offset
+                Post.objects.bulk_create(posts)
+                links = []
+                for post in posts:
+                    post_tags = {self.pick(tags).pk for _ in range(options['tags_per_post'])} if tags else set()
+                    links.extend(through(post_id=post.pk, tag_id=tag_id) for tag_id in post_tags)
+                through.objects.bulk_create(links)
+            bump_fragment_versions([post.pk for post in posts], *FRAGMENT_PARTS)
+            created += size
+            self.stdout.write(f'{created} post(s)')
+        return created
+
+    # 포스트마다 댓글 수는 평균이 --comments인 지수 분포라 댓글이 아주 많은 포스트가 생긴다
+    def create_comments(self, options, users):
+        if not options['comments']:
+            return 0
+        created = 0
+        comments = []
+        post_pks = Post.objects.filter(author__username__startswith=f'{PREFIX}_').values_list('pk', flat=True)
+        for post_pk in list(post_pks):
+            for _ in range(int(self.random.expovariate(1 / options['comments']))):
+                comments.append(Comment(post_id=post_pk, author=self.random.choice(users), content=self.words(30)))
+            if len(comments) >= BATCH_SIZE:
+                self.save_comments(comments)
+                created += len(comments)
+                comments = []
+        self.save_comments(comments)
+        return created + len(comments)
+
+    def save_comments(self, comments):
+        Comment.objects.bulk_create(comments)
+        bump_fragment_versions({comment.post_id for comment in comments}, 'comments')
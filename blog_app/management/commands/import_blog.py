@@ -0,0 +1,32 @@
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from blog_app.backup import BlogImporter, open_ndjson
+from blog_app.page_cache import bump_content_state
+
+# python manage.py import_blog backup.ndjson.gz
+# export_blog로 내보낸 파일을 가져온다, batch_size개씩 bulk_create로 저장하고 커밋한다
+# 시그널을 거치지 않으므로 마지막에 카테고리 포스트 수와 검색 인덱스를 다시 만들고 페이지 캐시를 무효화한다
+class Command(BaseCommand):
+    help = 'Import a newline-delimited JSON file written by export_blog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        importer = BlogImporter(options['batch_size'])
+        f = open_ndjson(options['path'], 'r')
+        try:
+            counts = importer.run(f)
+        except (ValueError, KeyError) as e:
+            raise CommandError(f'가져오기 실패: {e!r}, 그 전까지 저장된 데이터는 남아 있습니다')
+        finally:
+            f.close()
+
+        call_command('recount_categories', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        bump_content_state()
+        summary = ', '.join(f'{count} {model}(s)' for model, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'{summary} imported in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from blog_app.models import Post
+from blog_app.search import get_backend, clear_search_cache
+
+# python manage.py rebuild_search_index
+# 검색 인덱스를 비우고 모든 포스트를 다시 색인한다
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    # iterator()는 prefetch_related를 무시하므로 pk 순서로 잘라서 태그와 함께 가져온다
+    def iter_posts(self, batch_size):
+        last_pk = 0
+        while True:
+            batch = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').prefetch_related('tags')[:batch_size])
+            if not batch:
+                return
+            yield from batch
+            last_pk = batch[-1].pk
+
+    def handle(self, *args, **options):
+        backend = get_backend(for_write=True)
+        backend.install()
+        count = backend.rebuild(self.iter_posts(options['batch_size']))
+        clear_search_cache()
+        self.stdout.write(self.style.SUCCESS(f'{count} post(s) indexed with {type(backend).__name__}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from blog_app.models import CategoryPostCount
+from blog_app.context_processors import invalidate_sidebar
+
+# python manage.py recount_categories
+# 사이드바에 쓰는 카테고리별 포스트 수가 어긋났을 때 실제 포스트 수로 다시 맞춘다
+class Command(BaseCommand):
+    help = 'Recount the denormalized per-category post counts (including 미분류)'
+
+    def handle(self, *args, **options):
+        CategoryPostCount.recount()
+        invalidate_sidebar()
+        for row in CategoryPostCount.objects.select_related('category').order_by('category_id'):
+            self.stdout.write(str(row))
+        self.stdout.write(self.style.SUCCESS('category post counts recounted'))
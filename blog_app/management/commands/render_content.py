@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from blog_app.models import Post
+
+# python manage.py render_content
+# 저장된 html이 없거나 content와 맞지 않는 포스트의 마크다운을 다시 렌더링해서 저장
+class Command(BaseCommand):
+    help = 'Render Post.content markdown into the stored content_html cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='re-render every post even if the hash matches')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        force = options['force']
+        batch_size = options['batch_size']
+
+        # update_at이 바뀌지 않도록 save()가 아니라 bulk_update로 저장
+        fields = ['content_html', 'content_hash', 'excerpt']
+        posts = Post.objects.only('pk', 'content', 'content_hash').order_by('pk')
+        batch = []
+        rendered = 0
+        for post in posts.iterator(chunk_size=batch_size):
+            if post.render_content(force=force):
+                batch.append(post)
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, fields)
+                rendered += len(batch)
+                batch = []
+        if batch:
+            Post.objects.bulk_update(batch, fields)
+            rendered += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'{rendered} post(s) rendered'))
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from blog_app.jobs import run_pending_jobs
+from blog_app.models import Job
+
+# python manage.py run_jobs
+# 작업 큐(Job)의 작업을 처리하는 워커, 멈출 때까지 새 작업을 기다리며 처리한다
+# python manage.py run_jobs --once : 지금 있는 작업만 처리하고 끝낸다(cron, 테스트용)
+# python manage.py run_jobs --status : 상태별 작업 수와 실패한 작업을 보여준다
+class Command(BaseCommand):
+    help = 'Process queued background jobs (upload post-processing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='process the jobs that are ready and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='seconds to wait when the queue is empty')
+        parser.add_argument('--status', action='store_true', help='print job counts by status and failed jobs')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            return self.print_status()
+        while True:
+            for job in run_pending_jobs():
+                self.report(job)
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+    def report(self, job):
+        if job.status == Job.DONE:
+            self.stdout.write(self.style.SUCCESS(f'{job} (attempt {job.attempts})'))
+        elif job.status == Job.PENDING:
+            self.stdout.write(self.style.WARNING(f'{job} retry at {job.run_after:%Y-%m-%d %H:%M:%S} (attempt {job.attempts}/{job.max_attempts})'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{job} failed after {job.attempts} attempt(s)'))
+            self.stdout.write(job.last_error)
+
+    def print_status(self):
+        counts = dict(Job.objects.order_by().values_list('status').annotate(n=Count('pk')))
+        for status, label in Job.STATUS_CHOICES:
+            self.stdout.write(f'{status}: {counts.get(status, 0)}')
+        for job in Job.objects.filter(status=Job.FAILED).order_by('-modified_at')[:10]:
+            last_line = job.last_error.strip().splitlines()[-1] if job.last_error.strip() else ''
+            self.stdout.write(self.style.ERROR(f'{job} {last_line}'))
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:01
+
+import hashlib
+from django.db import migrations, models
+from django.utils.text import Truncator
+from markdownx.utils import markdown
+
+BATCH_SIZE = 500
+
+
+# 기존 포스트의 html, 해시, 요약을 채운다, 마이그레이션에서는 모델의 메소드를 쓸 수 없으므로 Post.render_content와 같은 일을 한다
+# 포스트가 많아도 메모리를 적게 쓰도록 pk 순서로 BATCH_SIZE개씩 처리한다
+def render_existing_posts(apps, schema_editor):
+    Post = apps.get_model('blog_app', 'Post')
+    last_pk = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'content')[:BATCH_SIZE])
+        if not posts:
+            return
+        for post in posts:
+            post.content_html = markdown(post.content)
+            post.content_hash = hashlib.sha1(post.content.encode('utf-8')).hexdigest()
+            post.excerpt = Truncator(post.content_html).words(45, html=True, truncate=' …')
+        Post.objects.bulk_update(posts, ['content_html', 'content_hash', 'excerpt'])
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0014_post_content_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# 기존 포스트로 카테고리별 포스트 수를 채운다
+def fill_category_counts(apps, schema_editor):
+    Post = apps.get_model('blog_app', 'Post')
+    Category = apps.get_model('blog_app', 'Category')
+    CategoryPostCount = apps.get_model('blog_app', 'CategoryPostCount')
+
+    counts = dict(Post.objects.order_by().values_list('category').annotate(n=models.Count('pk')))
+    category_ids = [None] + list(Category.objects.values_list('pk', flat=True))
+    CategoryPostCount.objects.bulk_create([
+        CategoryPostCount(category_id=category_id, count=counts.get(category_id, 0))
+        for category_id in category_ids
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0015_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPostCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counter', to='blog_app.category')),
+            ],
+        ),
+        migrations.RunPython(fill_category_counts, migrations.RunPython.noop),
+    ]
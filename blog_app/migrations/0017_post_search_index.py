@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+# 검색 백엔드의 인덱스 테이블을 만들고 기존 포스트를 색인한다, blog_app/search
+def install_search_index(apps, schema_editor):
+    from blog_app.search import get_backend
+    Post = apps.get_model('blog_app', 'Post')
+    backend = get_backend(using=schema_editor.connection.alias)
+    backend.install()
+    backend.rebuild(Post.objects.using(schema_editor.connection.alias).prefetch_related('tags'))
+
+
+def uninstall_search_index(apps, schema_editor):
+    from blog_app.search import get_backend
+    get_backend(using=schema_editor.connection.alias).uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0016_categorypostcount'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
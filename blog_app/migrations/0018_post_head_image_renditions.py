@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0017_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='head_image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# 이미 올라와 있는 파일의 후처리 작업을 작업 큐에 넣는다, python manage.py run_jobs 가 처리한다
+def enqueue_existing_uploads(apps, schema_editor):
+    Post = apps.get_model('blog_app', 'Post')
+    Job = apps.get_model('blog_app', 'Job')
+    db_alias = schema_editor.connection.alias
+    jobs = []
+    for pk, head_image, file_upload in Post.objects.using(db_alias).values_list('pk', 'head_image', 'file_upload'):
+        if head_image:
+            jobs.append(Job(name='post.head_image', kwargs={'post_pk': pk}))
+        if file_upload:
+            jobs.append(Job(name='post.file_checksum', kwargs={'post_pk': pk}))
+    Job.objects.using(db_alias).bulk_create(jobs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0018_post_head_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', '대기'), ('running', '실행 중'), ('done', '완료'), ('failed', '실패')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='file_upload_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_after'], name='blog_app_jo_status_9ae396_idx'),
+        ),
+        migrations.RunPython(enqueue_existing_uploads, migrations.RunPython.noop),
+    ]
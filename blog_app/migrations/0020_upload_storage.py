@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:21
+
+import blog_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0019_job_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='file_upload',
+            field=models.FileField(blank=True, max_length=255, storage=blog_app.storage.get_upload_storage, upload_to='blog_app/files/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='head_image',
+            field=models.ImageField(blank=True, max_length=255, storage=blog_app.storage.get_upload_storage, upload_to='blog_app/images/%Y/%m/%d/'),
+        ),
+    ]
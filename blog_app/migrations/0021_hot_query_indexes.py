@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+# Tag.name을 unique로 바꾸기 전에 이름이 같은 태그를 pk가 가장 작은 태그 하나로 합친다
+# 한 포스트가 같은 이름의 태그 여러 개에 연결되어 있으면 연결을 하나만 남긴다(남길 태그의 연결을 먼저 남긴다)
+# 그래야 연결을 남길 태그로 바꿔도 (post, tag)가 겹치지 않는다
+def merge_duplicate_tags(apps, schema_editor):
+    Tag = apps.get_model('blog_app', 'Tag')
+    Post = apps.get_model('blog_app', 'Post')
+    through = Post.tags.through
+    db_alias = schema_editor.connection.alias
+    duplicates = Tag.objects.using(db_alias).values('name').annotate(n=Count('pk')).filter(n__gt=1)
+    for name in duplicates.values_list('name', flat=True):
+        keep, *others = Tag.objects.using(db_alias).filter(name=name).order_by('pk').values_list('pk', flat=True)
+        links = through.objects.using(db_alias).filter(tag_id__in=[keep, *others])
+        seen = set()
+        redundant = []
+        for pk, post_id, tag_id in sorted(links.values_list('pk', 'post_id', 'tag_id'), key=lambda link: (link[1], link[2] != keep, link[0])):
+            if post_id in seen:
+                redundant.append(pk)
+            seen.add(post_id)
+        through.objects.using(db_alias).filter(pk__in=redundant).delete()
+        through.objects.using(db_alias).filter(tag_id__in=others).update(tag_id=keep)
+        Tag.objects.using(db_alias).filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0020_upload_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-id'], name='post_category_recent_idx'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='blog_app.post'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='blog_app.category'),
+        ),
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
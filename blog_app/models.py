@@ -1,18 +1,40 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 # user model은 장고에서 기본적으로 제공하는 모델이다
 from django.contrib.auth.models import User
 import os
+import hashlib
 # form 필드에 markdown을 입력할 필드
 from markdownx.models import MarkdownxField
 # form에 입력힌 내용이 그냥 보이지는 않으므로 get_content_markdown()매서드로 마크다운 적용
 from markdownx.utils import markdown
+from django.utils import timezone
+from django.utils.text import Truncator
+from .images import build_renditions, delete_renditions
+from .storage import get_upload_storage
+from .instrumentation import timer
 
 # Create your models here.
 # pip install django_extensions, django shell+, 설치 후 settings.py에 설정
 # pip install ipython, django shell+
 
+# content의 해시값, 렌더링된 html이 현재 content로 만든 것인지 확인할 때 사용
+def get_content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+# 사용자의 아바타 url, 소셜 로그인 계정이 있으면 그 계정의 아바타를 사용
+# author__socialaccount_set을 prefetch 했다면 쿼리 없이, 아니면 쿼리 한 번으로 가져온다
+def get_avatar_url(user):
+    for social_account in user.socialaccount_set.all()[:1]:
+        return social_account.get_avatar_url()
+    # https://doitdjango.com/avatar/
+    #'http://placehold.it/50x50'
+    return f'https://doitdjango.com/avatar/id/103/4f5aaf0cec9960c2/svg/{user.email}'
+
 class Tag(models.Model):
-    name = models.CharField(max_length=50)
+    # services.get_or_create_tags가 이름으로도 찾으므로 unique(인덱스)
+    name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=200, unique=True, allow_unicode=True)
 
     def __str__(self):
@@ -37,15 +59,36 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
 
+class PostQuerySet(models.QuerySet):
+    # 목록 페이지용 쿼리셋, 카드에서 쓰는 작성자/카테고리/태그를 미리 불러오고 content 전체는 불러오지 않는다
+    def for_listing(self):
+        return self.select_related('author', 'category').prefetch_related('tags').defer(
+            'content', 'content_html', 'content_hash',
+        )
+
+    # 작성자와 아바타에 필요한 소셜 계정을 미리 불러온다, 포스트 수와 상관없이 쿼리 수가 일정하다
+    def with_author_avatars(self):
+        return self.select_related('author').prefetch_related('author__socialaccount_set')
+
 class Post(models.Model):
     title = models.CharField(max_length=30)
     hook_text = models.CharField(max_length=100, blank=True)
     content = MarkdownxField()
+    # content를 마크다운으로 렌더링한 결과, content가 바뀌어서 저장될 때만 다시 만든다
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+    # 목록 페이지에 보여줄 요약, content_html을 앞에서부터 45단어만 남긴 html
+    excerpt = models.TextField(blank=True, editable=False)
 
     # upload_to : 이미지를 저장할 폴더의 경로 규칙을 지정, blank=True를 하면 필수 항목이 아니게 된다
     # python -m pip install Pillow
-    head_image = models.ImageField(upload_to = 'blog_app/images/%Y/%m/%d/', blank=True)
-    file_upload = models.FileField(upload_to='blog_app/files/%Y/%m/%d/', blank=True)
+    # 같은 파일은 한 번만 저장하는 저장소를 사용, storage.py
+    head_image = models.ImageField(upload_to = 'blog_app/images/%Y/%m/%d/', blank=True, max_length=255, storage=get_upload_storage)
+    # head_image를 줄인 이미지들의 목록(manifest), images.py
+    head_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    file_upload = models.FileField(upload_to='blog_app/files/%Y/%m/%d/', blank=True, max_length=255, storage=get_upload_storage)
+    # file_upload의 sha256, 업로드 후 작업 큐(jobs.py)에서 계산해서 채운다
+    file_upload_sha256 = models.CharField(max_length=64, blank=True, editable=False)
     # 포스트 생성시 자동으로 저장되는 모델, auto_now_add=True 처음 레코드가 생성될 때 자동으로 저장
     created_at = models.DateTimeField(auto_now_add=True)
     # 수정 시 자동으로 저장되는 모델, auto_now=True 다시 저장할때 자동으로 저장
@@ -58,12 +101,21 @@ class Post(models.Model):
     author = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
 
     # blank = True, 관리자 페이지에서 카테고리를 빈 칸으로 지정할  수 있게 해준다
-    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL)
+    # category_id 인덱스는 아래 Meta의 (category, -id) 인덱스가 대신한다
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
 
     # 서로 여러 요소와 동시에 연결될 수 있는 다대다 관계, ManyToManyField
     # ManyToManyField는 기본적으로 null = True를 제공
     tags = models.ManyToManyField(Tag, blank=True)
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # 카테고리 페이지와 미분류 페이지(category_id IS NULL), category_id로 찾고 최신 글(-pk) 순서로 읽는다
+            models.Index(fields=['category', '-id'], name='post_category_recent_idx'),
+        ]
+
     # django admin Post 모델 제목
     def __str__(self):
         # {self.pk} : 해당 포스트의 pk 값
@@ -73,30 +125,155 @@ class Post(models.Model):
     def get_absolute_url(self):
         return f'/blog/{self.pk}/'
 
+    # 파일은 MEDIA_URL로 바로 받지 않고 downloads.py의 다운로드 뷰를 거친다
+    def get_download_url(self):
+        return f'/blog/{self.pk}/download/'
+
+    def get_head_image_url(self):
+        return f'/blog/{self.pk}/head_image/'
+
     def get_file_name(self):
         return os.path.basename(self.file_upload.name)
 
     def get_file_ext(self):
         return self.get_file_name().split('.')[-1]
 
-    # detail에 적용
+    # DB에서 불러온 시점의 category_id를 기억해두고, 저장할 때 카테고리가 바뀌었는지 확인하는 데 사용
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Post, cls).from_db(db, field_names, values)
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_file_upload = instance.__dict__.get('file_upload')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if self.render_content() and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'content_hash', 'excerpt'}
+        # 포스트 저장과 post_save 시그널에서 하는 카테고리 포스트 수 갱신을 하나의 트랜잭션으로 묶는다
+        with transaction.atomic():
+            super(Post, self).save(*args, **kwargs)
+            # 업로드한 파일은 위의 save에서 저장되므로 그 다음에 후처리 작업을 작업 큐에 넣는다
+            self.enqueue_upload_jobs(update_fields)
+
+    # 리사이즈 이미지, 체크섬 계산처럼 오래 걸리는 작업은 요청 안에서 하지 않고 python manage.py run_jobs 가 처리한다
+    # 포스트 저장과 같은 트랜잭션에서 작업을 넣으므로 저장이 취소되면 작업도 없어진다
+    def enqueue_upload_jobs(self, update_fields=None):
+        if update_fields is None or 'head_image' in update_fields:
+            if (self.head_image_renditions or {}).get('source') != (self.head_image.name or None):
+                if self.head_image:
+                    Job.enqueue('post.head_image', post_pk=self.pk)
+                else:
+                    # 이미지를 지운 경우는 이전 리사이즈 이미지만 지우면 되므로 바로 처리
+                    self.update_head_image_renditions()
+        if update_fields is None or 'file_upload' in update_fields:
+            if self.file_upload.name != getattr(self, '_loaded_file_upload', None):
+                if self.file_upload:
+                    Job.enqueue('post.file_checksum', post_pk=self.pk)
+                elif self.file_upload_sha256:
+                    self.file_upload_sha256 = ''
+                    Post.objects.filter(pk=self.pk).update(file_upload_sha256='')
+            self._loaded_file_upload = self.file_upload.name
+
+    # head_image가 manifest를 만든 이미지와 다르면 리사이즈 이미지를 다시 만든다, 다시 만들었다면 True를 return
+    def update_head_image_renditions(self, force=False):
+        manifest = self.head_image_renditions or {}
+        source = self.head_image.name or None
+        if not force and manifest.get('source') == source:
+            return False
+        storage = self.head_image.storage
+        delete_renditions(storage, manifest)
+        self.head_image_renditions = build_renditions(self.head_image) if source else {}
+        # update_at이 바뀌지 않도록 save()가 아니라 update로 저장
+        Post.objects.filter(pk=self.pk).update(head_image_renditions=self.head_image_renditions)
+        return True
+
+    # content가 바뀐 경우에만 마크다운을 다시 렌더링, 렌더링 했다면 True를 return
+    def render_content(self, force=False):
+        content_hash = get_content_hash(self.content)
+        if not force and content_hash == self.content_hash:
+            return False
+        with timer('markdown'):
+            self.content_html = markdown(self.content)
+        self.content_hash = content_hash
+        # 템플릿의 truncatewords_html:45 와 같은 결과
+        self.excerpt = Truncator(self.content_html).words(45, html=True, truncate=' …')
+        return True
+
+    # detail에 적용, 저장된 html이 현재 content와 맞으면 다시 렌더링하지 않는다
     def get_content_markdown(self):
-        return markdown(self.content)
+        if self.content_hash and self.content_hash == get_content_hash(self.content):
+            return self.content_html
+        # 요청 중이면 instrumentation.py가 렌더링 시간을 잰다
+        with timer('markdown'):
+            return markdown(self.content)
 
     # avatar
     def get_avatar_url(self):
-        if self.author.socialaccount_set.exists():
-            return self.author.socialaccount_set.first().get_avatar_url()
-        else :
-            return f'https://doitdjango.com/avatar/id/103/4f5aaf0cec9960c2/svg/{self.author.email}'
+        return get_avatar_url(self.author)
+
+class CategoryPostCount(models.Model):
+    # 사이드바에 보여줄 카테고리별 포스트 수, category가 None인 행이 '미분류'
+    # 포스트가 생성/삭제되거나 카테고리가 바뀔 때 signals.py에서 갱신된다
+    # 숫자가 어긋났다면 python manage.py recount_categories 로 다시 센다
+    category = models.OneToOneField(Category, null=True, blank=True, on_delete=models.CASCADE, related_name='counter')
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.category or "미분류"} ({self.count})'
+
+    # category_id 카테고리의 포스트 수를 delta만큼 더한다, 행이 없으면 실제로 세서 만든다
+    @classmethod
+    def add(cls, category_id, delta):
+        updated = cls.objects.filter(category_id=category_id).update(count=Greatest(F('count') + delta, 0))
+        if not updated:
+            cls.objects.create(category_id=category_id, count=Post.objects.filter(category_id=category_id).count())
+
+    # 모든 카테고리와 미분류의 포스트 수를 다시 센다
+    @classmethod
+    def recount(cls):
+        with transaction.atomic():
+            counts = dict(Post.objects.order_by().values_list('category').annotate(n=Count('pk')))
+            category_ids = [None] + list(Category.objects.values_list('pk', flat=True))
+            # 미분류 행이 여러 개 생긴 경우 하나만 남긴다
+            no_category_rows = list(cls.objects.filter(category=None).values_list('pk', flat=True))
+            cls.objects.filter(pk__in=no_category_rows[1:]).delete()
+            for category_id in category_ids:
+                cls.objects.update_or_create(category_id=category_id, defaults={'count': counts.get(category_id, 0)})
+
+    # 사이드바용 (카테고리 목록, 미분류 포스트 수), 쿼리 한 번으로 가져온다
+    # 각 카테고리의 포스트 수는 category.counter.count 로 쓸 수 있다
+    @classmethod
+    def sidebar(cls):
+        categories = []
+        no_category_post_count = 0
+        for row in cls.objects.select_related('category').order_by('category_id'):
+            if row.category is None:
+                no_category_post_count = row.count
+            else:
+                categories.append(row.category)
+        return categories, no_category_post_count
+
+class CommentQuerySet(models.QuerySet):
+    # 댓글 목록용, 작성자와 아바타에 필요한 소셜 계정을 미리 불러온다
+    def with_author_avatars(self):
+        return self.select_related('author').prefetch_related('author__socialaccount_set')
 
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # post_id 인덱스는 아래 Meta의 (post, created_at, id) 인덱스가 대신한다
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        # 포스트의 댓글을 작성 순서(created_at, pk)로 페이지네이션, views.paginate_comments
+        indexes = [models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx')]
+
     def __str__(self):
         return f'{self.author}::{self.content}'
 
@@ -104,9 +281,44 @@ class Comment(models.Model):
         return f'{self.post.get_absolute_url()}#comment-{self.pk}'
 
     def get_avatar_url(self):
-        if self.author.socialaccount_set.exists():
-            return self.author.socialaccount_set.first().get_avatar_url()
-        else :
-            # https://doitdjango.com/avatar/
-            #'http://placehold.it/50x50'
-            return f'https://doitdjango.com/avatar/id/103/4f5aaf0cec9960c2/svg/{self.author.email}'
\ No newline at end of file
+        return get_avatar_url(self.author)
+
+class Job(models.Model):
+    # 데이터베이스를 사용하는 작업 큐, 별도의 브로커 없이 python manage.py run_jobs 로 처리한다
+    # 작업 함수는 jobs.py의 @register('이름')으로 등록하고 Job.enqueue('이름', 인자=값)으로 넣는다
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, '대기'),
+        (RUNNING, '실행 중'),
+        (DONE, '완료'),
+        (FAILED, '실패'),
+    )
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # 실패하면 run_after를 늦춰서 다시 시도하고, max_attempts번 실패하면 FAILED가 된다
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f'[{self.pk}]{self.name} {self.kwargs} :: {self.status}'
+
+    # 같은 작업이 이미 대기 중이면 새로 넣지 않는다
+    @classmethod
+    def enqueue(cls, name, max_attempts=3, **kwargs):
+        job = cls.objects.filter(name=name, kwargs=kwargs, status=cls.PENDING).first()
+        if job is None:
+            job = cls.objects.create(name=name, kwargs=kwargs, max_attempts=max_attempts)
+        return job
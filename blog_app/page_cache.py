@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+
+# 로그인하지 않은 사용자에게 보여주는 페이지 전체 캐시
+# 로그인하지 않은 사용자는 누구나 같은 페이지를 보므로 URL마다 렌더링한 HTML을 그대로 저장해두고 다시 쓴다
+# 포스트, 카테고리, 태그, 댓글이 바뀌면 signals.py에서 콘텐츠 버전을 바꾸므로 이전 페이지는 더 이상 쓰이지 않는다
+#
+# 응답에는 ETag(콘텐츠 버전 + URL)와 Last-Modified(마지막으로 콘텐츠가 바뀐 시각)를 넣는다
+# 브라우저가 If-None-Match / If-Modified-Since로 다시 요청하면 템플릿을 렌더링하지 않고 304를 돌려준다
+# 로그인한 사용자는 수정 버튼, 댓글 폼처럼 사용자마다 다른 내용이 있으므로 매번 렌더링한다
+#
+# 캐시 키에는 경로와 뷰가 읽는 쿼리 파라미터(query_params)만 정렬해서 넣는다
+# 다른 파라미터가 붙은 요청(?x=1, ?x=2 ...)은 캐시하지 않으므로 임의의 URL로 캐시를 채워 진짜 페이지를 밀어낼 수 없다
+#   anonymous_page_cache(view)                   : cursor, page, q 를 읽는 뷰
+#   anonymous_page_cache(view, query_params=())  : 쿼리 파라미터를 읽지 않는 뷰(상세 페이지 등)
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_QUERY_PARAMS = ('cursor', 'page', 'q')
+CONTENT_STATE_KEY = 'blog_app:content:state'
+
+
+# 콘텐츠 버전과 마지막으로 바뀐 시각(timestamp)
+# 캐시에서 사라졌다면 DB에 남아 있는 가장 최근 수정 시각으로 다시 만든다
+def get_content_state():
+    state = cache.get(CONTENT_STATE_KEY)
+    if state is None:
+        from .models import Post, Comment
+        times = [
+            Post.objects.aggregate(last=Max('update_at'))['last'],
+            Comment.objects.aggregate(last=Max('modified_at'))['last'],
+        ]
+        times = [t.timestamp() for t in times if t is not None]
+        state = {'version': uuid.uuid4().hex, 'modified': max(times) if times else time.time()}
+        cache.set(CONTENT_STATE_KEY, state, None)
+    return state
+
+
+# signals.py에서 콘텐츠가 바뀔 때 호출
+# 포스트 삭제처럼 update_at으로는 알 수 없는 변경도 있으므로 바뀐 시각을 따로 기록한다
+# 커밋 전에 들어온 요청이 이전 내용을 새 버전으로 저장할 수 있으므로 커밋 후에 한 번 더 바꾼다
+def bump_content_state():
+    def bump():
+        cache.set(CONTENT_STATE_KEY, {'version': uuid.uuid4().hex, 'modified': time.time()}, None)
+    bump()
+    transaction.on_commit(bump)
+
+
+# 캐시 키에 쓸 URL, 뷰가 읽지 않는 쿼리 파라미터가 있으면 None (캐시하지 않는다)
+def get_cache_url(request, query_params):
+    if any(name not in query_params for name in request.GET):
+        return None
+    query = urlencode(sorted(
+        (name, value) for name in request.GET for value in request.GET.getlist(name)
+    ))
+    return f'{request.path}?{query}' if query else request.path
+
+
+def get_page_cache_key(state, url):
+    return f'blog_app:page:{state["version"]}:{hashlib.sha1(url.encode("utf-8")).hexdigest()}'
+
+
+def get_etag(state, url):
+    return quote_etag(hashlib.sha1(f'{state["version"]}:{url}'.encode('utf-8')).hexdigest())
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 브라우저는 저장해두되 쓸 때마다 서버에 확인한다(304), 로그인하면 쿠키가 달라지므로 따로 저장한다
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+# 뷰를 실행하기 전에 304나 캐시된 페이지로 답할 수 있으면 (응답, None)
+# 뷰를 실행해야 하면 (None, 응답을 받아서 캐시에 저장하는 함수), 로그인한 사용자는 (None, None)
+def get_cached_response(request, query_params=PAGE_CACHE_QUERY_PARAMS):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return None, None
+    url = get_cache_url(request, query_params)
+    if url is None:
+        return None, None
+
+    state = get_content_state()
+    etag = get_etag(state, url)
+    last_modified = int(state['modified'])
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified), None
+
+    key = get_page_cache_key(state, url)
+    cached = cache.get(key)
+    if cached is not None:
+        response = HttpResponse(cached['content'], content_type=cached['content_type'])
+        return set_validators(response, etag, last_modified), None
+
+    def store(response):
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        # 쿠키를 설정하는 응답(CSRF 토큰, 메시지 등)은 다른 사용자에게 보여주면 안 되므로 저장하지 않는다
+        # CSRF 쿠키는 뷰가 끝난 뒤 미들웨어에서 설정되므로 CSRF_COOKIE_USED로 확인한다
+        if response.status_code != 200 or response.streaming or response.cookies \
+                or request.META.get('CSRF_COOKIE_USED'):
+            return response
+        cache.set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }, PAGE_CACHE_TIMEOUT)
+        return set_validators(response, etag, last_modified)
+    return None, store
+
+
+# 비동기 뷰(async_views.py)에도 쓸 수 있다, 로그인 사용자 확인과 캐시 조회는 DB를 쓸 수 있으므로 스레드에서 실행한다
+def anonymous_page_cache(view, query_params=PAGE_CACHE_QUERY_PARAMS):
+    if asyncio.iscoroutinefunction(view):
+        async def async_wrapper(request, *args, **kwargs):
+            response, store = await sync_to_async(get_cached_response)(request, query_params)
+            if response is not None:
+                return response
+            response = await view(request, *args, **kwargs)
+            if store is not None:
+                response = await sync_to_async(store)(response)
+            return response
+        return wraps(view)(async_wrapper)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response, store = get_cached_response(request, query_params)
+        if response is not None:
+            return response
+        response = view(request, *args, **kwargs)
+        if store is not None:
+            response = store(response)
+        return response
+    return wrapper
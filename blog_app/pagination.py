@@ -0,0 +1,176 @@
+import base64
+import binascii
+import datetime
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+# 커서(keyset) 페이지네이션
+# ?page=N 처럼 OFFSET으로 앞의 행을 모두 건너뛰지 않고 마지막으로 본 행의 정렬 값 다음부터 가져온다
+# 그래서 몇 번째 페이지든 첫 페이지와 같은 비용이 들고, 전체 개수를 세는 COUNT(*) 쿼리도 필요 없다
+# 정렬 필드의 마지막은 pk처럼 값이 겹치지 않는 필드여야 한다
+
+
+# DjangoJSONEncoder는 datetime을 밀리초까지만 남기므로 커서에는 마이크로초까지 그대로 넣는다
+class CursorJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+# 커서 페이지네이터의 공통 부분, 커서는 [방향('next' 또는 'prev'), 값]을 JSON으로 만들어 base64로 인코딩한 문자열
+class CursorPaginator:
+    # cursor_param : 다음/이전 페이지 커서를 받을 GET 파라미터 이름
+    cursor_param = 'cursor'
+
+    def __init__(self, per_page):
+        self.per_page = int(per_page)
+
+    def _dump_cursor(self, direction, value):
+        raw = json.dumps([direction, value], cls=CursorJSONEncoder)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    # 잘못된 커서는 404, value는 하위 클래스의 _clean_cursor_value()로 확인한다
+    # 올바르게 인코딩되었지만 값이 맞지 않는 커서(직접 만든 커서)도 500이 아니라 404
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, value = json.loads(raw.decode('utf-8'))
+            if direction not in ('next', 'prev'):
+                raise ValueError
+            value = self._clean_cursor_value(value)
+        except (ValueError, TypeError, ValidationError, binascii.Error, UnicodeDecodeError):
+            raise Http404('잘못된 페이지 커서입니다')
+        return direction, value
+
+    def _clean_cursor_value(self, value):
+        return value
+
+
+class KeysetPaginator(CursorPaginator):
+    def __init__(self, queryset, per_page, ordering=('-pk',)):
+        super().__init__(per_page)
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+
+    def encode_cursor(self, direction, obj):
+        return self._dump_cursor(direction, [getattr(obj, self._attname(field)) for field in self.ordering])
+
+    def _clean_cursor_value(self, values):
+        # 정렬 필드마다 None이 아닌 단순한 값 하나씩
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise ValueError
+        return [self._field(field).to_python(value) for field, value in zip(self.ordering, values)]
+
+    def get_page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = False
+        else:
+            direction, values = self.decode_cursor(cursor)
+            if direction == 'next':
+                queryset = self.queryset.filter(self._after(values, reverse=False)).order_by(*self.ordering)
+                rows = list(queryset[:self.per_page + 1])
+                has_next = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                has_previous = True
+            else:
+                # 이전 페이지는 정렬을 뒤집어서 가져온 뒤 다시 원래 순서로 돌린다
+                reversed_ordering = [self._reverse(field) for field in self.ordering]
+                queryset = self.queryset.filter(self._after(values, reverse=True)).order_by(*reversed_ordering)
+                rows = list(queryset[:self.per_page + 1])
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                has_next = True
+
+        next_cursor = self.encode_cursor('next', rows[-1]) if has_next and rows else None
+        previous_cursor = self.encode_cursor('prev', rows[0]) if has_previous and rows else None
+        return KeysetPage(rows, has_next and bool(rows), has_previous and bool(rows), next_cursor, previous_cursor)
+
+    # 정렬 순서상 values 다음(reverse=True면 이전)에 오는 행만 남기는 조건
+    # (a, b) > (x, y)  ==  a > x or (a == x and b > y)
+    def _after(self, values, reverse):
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            if reverse:
+                descending = not descending
+            lookup = 'lt' if descending else 'gt'
+            term = Q(**{f'{field.lstrip("-")}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(self.ordering[:i], values[:i]):
+                term &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= term
+        return condition
+
+    def _field(self, field):
+        name = field.lstrip('-')
+        opts = self.queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _attname(self, field):
+        return self._field(field).attname
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+# 검색 결과처럼 이미 순서가 정해져 메모리(캐시)에 있는 리스트를 KeysetPaginator와 같은 커서 방식으로 나눈다
+# 커서에는 리스트에서의 위치가 들어간다
+class SequencePaginator(CursorPaginator):
+    def __init__(self, object_list, per_page):
+        super().__init__(per_page)
+        self.object_list = object_list
+
+    def encode_cursor(self, direction, position):
+        return self._dump_cursor(direction, position)
+
+    def _clean_cursor_value(self, position):
+        if not isinstance(position, int) or position < 0:
+            raise ValueError
+        return position
+
+    def get_page(self, cursor=None):
+        start = 0
+        if cursor:
+            direction, position = self.decode_cursor(cursor)
+            # next 커서는 다음 페이지의 시작 위치, prev 커서는 이전 페이지의 끝 위치
+            start = position if direction == 'next' else max(position - self.per_page, 0)
+        end = start + self.per_page
+        rows = self.object_list[start:end]
+        has_next = end < len(self.object_list)
+        has_previous = start > 0 and bool(rows)
+        next_cursor = self.encode_cursor('next', end) if has_next else None
+        previous_cursor = self.encode_cursor('prev', start) if has_previous else None
+        return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor)
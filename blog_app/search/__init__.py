@@ -0,0 +1,81 @@
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches, InvalidCacheBackendError
+from django.db import connections, router
+from django.utils.module_loading import import_string
+from .base import SEARCH_LIMIT
+
+# 포스트 검색 인덱스
+# title, hook_text, 렌더링된 content의 텍스트, 태그 이름을 검색 인덱스에 저장하고 순위가 매겨진 결과를 돌려준다
+# 인덱스는 signals.py에서 포스트가 저장/삭제되거나 태그가 바뀔 때 갱신되고
+# python manage.py rebuild_search_index 로 처음부터 다시 만들 수 있다
+#
+# 사용할 백엔드는 settings.BLOG_SEARCH_BACKEND 로 지정할 수 있고, 없으면 DB 종류에 맞춰 고른다
+
+BACKENDS = {
+    'sqlite': 'blog_app.search.sqlite.SQLiteSearchBackend',
+    'postgresql': 'blog_app.search.postgres.PostgresSearchBackend',
+}
+DEFAULT_BACKEND = 'blog_app.search.base.LikeSearchBackend'
+
+
+def get_backend(using=None, for_write=False):
+    from ..models import Post
+    if using is None:
+        using = router.db_for_write(Post) if for_write else router.db_for_read(Post)
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    if not path:
+        path = BACKENDS.get(connections[using].vendor, DEFAULT_BACKEND)
+    return import_string(path)(using)
+
+
+# 검색 결과 캐시, settings.CACHES의 'search' (짧은 TIMEOUT과 MAX_ENTRIES로 크기를 제한한 LocMemCache)
+# 같은 검색어(공백/대소문자 정리 후)는 TIMEOUT 동안 인덱스를 다시 조회하지 않는다
+# 'search'가 없으면 'default'를 함께 쓰므로 clear()로 비우지 않고, 키에 세대(generation)를 넣어 세대를 바꾼다
+# (default에는 페이지 캐시와 TIMEOUT이 없는 조각 캐시 버전이 있다)
+SEARCH_CACHE_ALIAS = 'search'
+GENERATION_KEY = 'blog_app:search:generation'
+
+
+def get_search_cache():
+    try:
+        return caches[SEARCH_CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def get_generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(GENERATION_KEY, generation, None)
+    return generation
+
+
+def normalize_query(q):
+    return ' '.join(q.split()).lower()
+
+
+# 인덱스가 바뀌면 signals.py에서 호출, 이전 세대의 결과는 더 이상 쓰이지 않고 TIMEOUT이 지나면 사라진다
+def clear_search_cache():
+    get_search_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+# 순위대로 정렬된 SearchHit 리스트
+def search_posts(q):
+    q = normalize_query(q)
+    if not q:
+        return []
+    cache = get_search_cache()
+    key = f'blog_app:search:{get_generation(cache)}:' + hashlib.sha1(q.encode('utf-8')).hexdigest()
+    hits = cache.get(key)
+    if hits is None:
+        hits = get_backend().search(q)
+        cache.set(key, hits)
+    return hits
+
+
+# 검색 결과 수, 결과는 SEARCH_LIMIT개까지만 가져오므로 그보다 많을 수 있으면 '1000+'
+def get_hit_count_label(hits):
+    return f'{SEARCH_LIMIT}+' if len(hits) >= SEARCH_LIMIT else str(len(hits))
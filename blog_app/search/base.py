@@ -0,0 +1,91 @@
+from collections import namedtuple
+from django.db.models import Q
+from django.utils.html import escape, strip_tags
+
+# pk : 포스트 pk, rank : 클수록 관련도가 높다, snippet : 검색어를 <mark>로 강조한 html 조각
+SearchHit = namedtuple('SearchHit', ['pk', 'rank', 'snippet'])
+
+# 백엔드가 snippet에서 검색어 앞뒤에 붙이는 표시, highlight()에서 <mark>로 바뀐다
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+# 검색 결과 최대 개수
+SEARCH_LIMIT = 1000
+
+
+def get_terms(q):
+    return [term for term in q.split() if term]
+
+
+# 인덱스에 넣을 포스트의 텍스트, content는 마크다운 문법이 아니라 렌더링된 html의 텍스트만 넣는다
+def get_document(post):
+    return {
+        'title': post.title,
+        'hook_text': post.hook_text,
+        'content': strip_tags(post.content_html or post.content),
+        'tags': ' '.join(tag.name for tag in post.tags.all()),
+    }
+
+
+# 백엔드가 돌려준 텍스트는 escape 하고 검색어 표시만 <mark>로 바꾼다
+def highlight(text):
+    if not text:
+        return ''
+    return escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class BaseSearchBackend:
+    def __init__(self, using):
+        self.using = using
+
+    # 인덱스 테이블 생성/삭제, 마이그레이션에서 호출
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def remove_post(self, pk):
+        raise NotImplementedError
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def rebuild(self, posts):
+        self.clear()
+        count = 0
+        for post in posts:
+            self.index_post(post)
+            count += 1
+        return count
+
+
+# 전문 검색을 지원하지 않는 DB용, 예전 PostSearch와 같은 LIKE 검색
+class LikeSearchBackend(BaseSearchBackend):
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, pk):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        from ..models import Post
+        condition = Q()
+        for term in get_terms(q):
+            condition &= (
+                Q(title__icontains=term) | Q(hook_text__icontains=term) |
+                Q(content__icontains=term) | Q(tags__name__icontains=term)
+            )
+        if not condition:
+            return []
+        pks = Post.objects.using(self.using).filter(condition).order_by('-pk').values_list('pk', flat=True).distinct()
+        return [SearchHit(pk, 0, '') for pk in pks[:limit]]
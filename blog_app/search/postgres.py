@@ -0,0 +1,67 @@
+from django.db import connections
+from .base import BaseSearchBackend, SearchHit, SEARCH_LIMIT, MARK_START, MARK_END, get_document, get_terms, highlight
+
+# PostgreSQL tsvector를 사용하는 검색 백엔드
+# 포스트마다 가중치를 준 tsvector를 한 행씩 저장하고 GIN 인덱스로 검색한다
+# 한국어 형태소 사전이 없으므로 'simple' 설정을 쓰고 검색어는 접두어 검색('포스트':*)으로 바꾼다
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    table = 'blog_app_post_search'
+    config = 'simple'
+
+    def execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description:
+                return cursor.fetchall()
+            return []
+
+    def install(self):
+        self.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            f'post_id integer PRIMARY KEY REFERENCES blog_app_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'body text NOT NULL, '
+            f'document tsvector NOT NULL)'
+        )
+        self.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_document ON {self.table} USING gin (document)')
+
+    def uninstall(self):
+        self.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def index_post(self, post):
+        document = get_document(post)
+        body = ' '.join(part for part in (document['title'], document['hook_text'], document['content']) if part)
+        self.execute(
+            f'INSERT INTO {self.table} (post_id, body, document) VALUES (%s, %s, '
+            f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'B') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'D') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'B')) "
+            f'ON CONFLICT (post_id) DO UPDATE SET body = EXCLUDED.body, document = EXCLUDED.document',
+            [post.pk, body, document['title'], document['hook_text'], document['content'], document['tags']],
+        )
+
+    def remove_post(self, pk):
+        self.execute(f'DELETE FROM {self.table} WHERE post_id = %s', [pk])
+
+    def clear(self):
+        self.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def build_tsquery(q):
+        return ' & '.join("'" + term.replace('\\', '\\\\').replace("'", "''") + "':*" for term in get_terms(q))
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        tsquery = self.build_tsquery(q)
+        if not tsquery:
+            return []
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=35, MinWords=15'
+        rows = self.execute(
+            f'SELECT post_id, ts_rank(document, query) AS score, '
+            f"ts_headline('{self.config}', body, query, %s) "
+            f"FROM {self.table}, to_tsquery('{self.config}', %s) AS query "
+            f'WHERE document @@ query ORDER BY score DESC, post_id DESC LIMIT %s',
+            [options, tsquery, limit],
+        )
+        return [SearchHit(pk, score, highlight(snippet)) for pk, score, snippet in rows]
@@ -0,0 +1,58 @@
+from django.db import connections
+from .base import BaseSearchBackend, SearchHit, SEARCH_LIMIT, MARK_START, MARK_END, get_document, get_terms, highlight
+
+# SQLite FTS5 가상 테이블을 사용하는 검색 백엔드
+# rowid가 포스트의 pk이고, unicode61 토크나이저는 공백/문장부호로 단어를 나눈다
+# '포스트' 로 '포스트입니다' 도 찾을 수 있도록 검색어는 모두 접두어 검색("포스트"*)으로 바꾼다
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    table = 'blog_app_post_fts'
+    # bm25 컬럼 가중치 : title, hook_text, content, tags
+    weights = (10.0, 5.0, 1.0, 5.0)
+
+    def execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def install(self):
+        self.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+            f"USING fts5(title, hook_text, content, tags, tokenize='unicode61')"
+        )
+
+    def uninstall(self):
+        self.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def index_post(self, post):
+        document = get_document(post)
+        self.remove_post(post.pk)
+        self.execute(
+            f'INSERT INTO {self.table} (rowid, title, hook_text, content, tags) VALUES (%s, %s, %s, %s, %s)',
+            [post.pk, document['title'], document['hook_text'], document['content'], document['tags']],
+        )
+
+    def remove_post(self, pk):
+        self.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [pk])
+
+    def clear(self):
+        self.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def build_match(q):
+        return ' '.join('"' + term.replace('"', '""') + '"*' for term in get_terms(q))
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        match = self.build_match(q)
+        if not match:
+            return []
+        weights = ', '.join(str(w) for w in self.weights)
+        rows = self.execute(
+            f'SELECT rowid, bm25({self.table}, {weights}) AS score, '
+            f"snippet({self.table}, -1, '{MARK_START}', '{MARK_END}', '…', 24) "
+            f'FROM {self.table} WHERE {self.table} MATCH %s ORDER BY score, rowid DESC LIMIT %s',
+            [match, limit],
+        )
+        # bm25는 작을수록 관련도가 높다
+        return [SearchHit(pk, -score, highlight(snippet)) for pk, score, snippet in rows]
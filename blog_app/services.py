@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from .models import Tag
+
+# PostCreate, PostUpdate에서 쓰는 태그 입력(tags_str) 처리
+
+
+# 대소문자만 다른 태그 이름을 같은 태그로 본다
+def normalize_tag_name(name):
+    return name.casefold()
+
+
+# 'python; django, 장고' 같은 문자열을 {정규화한 이름: 태그 이름} 으로 바꾼다
+# 세미콜론과 쉼표 모두 구분자로 처리하고, 앞뒤 공백을 지우고, 대소문자만 다른 이름은 하나만 남긴다
+# 'C++'와 'C#'처럼 slug가 같아도 이름이 다르면 다른 태그다
+def parse_tag_names(tags_str):
+    names = {}
+    if not tags_str:
+        return names
+    for name in tags_str.replace(',', ';').split(';'):
+        name = ' '.join(name.split())
+        # slug를 만들 수 없는 이름(문장부호만 있는 경우 등)은 태그 페이지 URL을 만들 수 없으므로 무시
+        if slugify(name, allow_unicode=True):
+            names.setdefault(normalize_tag_name(name), name)
+    return names
+
+
+# 정규화한 이름으로 태그를 찾는다, 이름이 정확히 같은 태그를 먼저 쓴다
+def find_tags(names):
+    query = Q()
+    for name in names:
+        query |= Q(name__iexact=name)
+    tags = {}
+    for tag in sorted(Tag.objects.filter(query), key=lambda tag: tag.name not in names):
+        tags.setdefault(normalize_tag_name(tag.name), tag)
+    return tags
+
+
+# 새 태그마다 이미 쓰이고 있지 않은 slug를 정한다, 겹치면 'c', 'c-2', 'c-3' ...
+def get_unique_slugs(names):
+    bases = [slugify(name, allow_unicode=True) for name in names]
+    query = Q()
+    for base in set(bases):
+        query |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+    taken = set(Tag.objects.filter(query).values_list('slug', flat=True))
+    slugs = []
+    for base in bases:
+        slug, number = base, 1
+        while slug in taken:
+            number += 1
+            slug = f'{base}-{number}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+# 이름에 해당하는 태그를 가져오고 없는 태그는 한꺼번에 만든다, 태그 수와 상관없이 쿼리 수가 일정하다
+def get_or_create_tags(names):
+    if not names:
+        return []
+    tags = find_tags(names.values())
+    # 동시에 다른 요청이 같은 이름이나 slug의 태그를 만들면 bulk_create가 그 태그를 건너뛰므로
+    # 이름으로 다시 찾고, 그래도 없으면(slug만 겹친 경우) 새 slug로 다시 만든다
+    for _ in range(3):
+        missing = [names[key] for key in names if key not in tags]
+        if not missing:
+            break
+        slugs = get_unique_slugs(missing)
+        # SQLite에서는 bulk_create가 pk를 채워주지 않으므로 만든 태그는 다시 조회한다
+        Tag.objects.bulk_create([Tag(name=name, slug=slug) for name, slug in zip(missing, slugs)], ignore_conflicts=True)
+        tags.update(find_tags(missing))
+    return [tags[key] for key in names if key in tags]
+
+
+# 포스트의 태그를 tags_str에 적힌 태그로 맞춘다
+# 전부 지우고 다시 추가하지 않고, 새로 생긴 태그만 add, 빠진 태그만 remove 한다
+def set_post_tags(post, tags_str):
+    with transaction.atomic():
+        tags = get_or_create_tags(parse_tag_names(tags_str))
+        wanted = {tag.pk for tag in tags}
+        current = set(post.tags.values_list('pk', flat=True))
+        if wanted - current:
+            post.tags.add(*(wanted - current))
+        if current - wanted:
+            post.tags.remove(*(current - wanted))
+    return tags
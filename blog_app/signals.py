@@ -0,0 +1,169 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Post, Category, Tag, Comment, CategoryPostCount
+from .context_processors import invalidate_sidebar
+from .search import get_backend as get_search_backend, clear_search_cache
+from .fragments import bump_fragment_versions
+from .page_cache import bump_content_state
+
+# apps.py의 BlogAppConfig.ready()에서 import 되면서 연결된다
+
+
+# 카테고리별 포스트 수 갱신
+# Post.save()가 트랜잭션 안에서 호출하므로 포스트 저장과 함께 커밋/롤백 된다
+@receiver(post_save, sender=Post)
+def update_category_count_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        CategoryPostCount.add(instance.category_id, 1)
+        invalidate_sidebar()
+    elif not hasattr(instance, '_loaded_category_id'):
+        # DB에서 불러오지 않은 인스턴스라 이전 카테고리를 알 수 없으므로 다시 센다
+        CategoryPostCount.recount()
+        invalidate_sidebar()
+    elif instance._loaded_category_id != instance.category_id:
+        CategoryPostCount.add(instance._loaded_category_id, -1)
+        CategoryPostCount.add(instance.category_id, 1)
+        invalidate_sidebar()
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Post)
+def update_category_count_on_delete(sender, instance, **kwargs):
+    CategoryPostCount.add(instance.category_id, -1)
+    invalidate_sidebar()
+
+
+@receiver(post_save, sender=Category)
+def create_category_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CategoryPostCount.objects.get_or_create(category=instance)
+    # 이름이나 slug가 바뀌어도 사이드바가 바뀐다
+    invalidate_sidebar()
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_sidebar_on_category_delete(sender, instance, **kwargs):
+    invalidate_sidebar()
+
+
+# 카테고리가 삭제되면 그 포스트들은 SET_NULL로 미분류가 되지만 post_save 시그널이 발생하지 않는다
+@receiver(pre_delete, sender=Category)
+def move_category_count_to_no_category(sender, instance, **kwargs):
+    count = Post.objects.filter(category=instance).count()
+    if count:
+        CategoryPostCount.add(None, count)
+
+
+# 검색 인덱스 갱신, blog_app/search
+# 인덱스가 바뀌면 캐시된 검색 결과도 지운다
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend(for_write=True).index_post(instance)
+        clear_search_cache()
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    get_search_backend(for_write=True).remove_post(instance.pk)
+    clear_search_cache()
+
+
+# 포스트의 태그가 바뀌면 태그 이름도 인덱스에 들어가므로 다시 색인한다
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_post_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    backend = get_search_backend(for_write=True)
+    if not reverse:
+        backend.index_post(instance)
+    elif pk_set:
+        for post in Post.objects.filter(pk__in=pk_set).prefetch_related('tags'):
+            backend.index_post(post)
+    clear_search_cache()
+
+
+@receiver(post_save, sender=Tag)
+def index_posts_on_tag_renamed(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    backend = get_search_backend(for_write=True)
+    for post in instance.post_set.prefetch_related('tags'):
+        backend.index_post(post)
+    clear_search_cache()
+
+
+# 포스트 상세 페이지 조각 캐시의 버전을 바꾼다, fragments.py
+@receiver(post_save, sender=Post)
+def bump_post_body_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_fragment_versions([instance.pk], 'body')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_post_tags_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_fragment_versions([instance.pk], 'tags')
+    elif pk_set:
+        bump_fragment_versions(pk_set, 'tags')
+    else:
+        # 태그 쪽에서 clear() 한 경우 어떤 포스트였는지 알 수 없으므로 pre_clear에서 기억해둔 포스트를 사용
+        bump_fragment_versions(getattr(instance, '_cleared_post_pks', []), 'tags')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def remember_tag_posts_on_clear(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_post_pks = list(instance.post_set.values_list('pk', flat=True))
+
+
+# 태그 이름이 바뀌거나 태그가 삭제되면 그 태그가 달린 포스트의 태그 조각이 바뀐다
+@receiver(post_save, sender=Tag)
+def bump_tag_posts_version(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_fragment_versions(instance.post_set.values_list('pk', flat=True), 'tags')
+
+
+@receiver(pre_delete, sender=Tag)
+def bump_deleted_tag_posts_version(sender, instance, **kwargs):
+    bump_fragment_versions(instance.post_set.values_list('pk', flat=True), 'tags')
+
+
+# 카테고리 이름은 포스트 본문 위에 보인다
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def bump_category_posts_version(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        bump_fragment_versions(instance.post_set.values_list('pk', flat=True), 'body')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_post_comments_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_fragment_versions([instance.post_id], 'comments')
+
+
+# 로그인하지 않은 사용자의 페이지 캐시와 ETag/Last-Modified, page_cache.py
+# 목록, 사이드바, 상세 페이지 어디에든 보일 수 있으므로 무엇이 바뀌든 콘텐츠 버전을 바꾼다
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_page_cache_on_change(sender, raw=False, **kwargs):
+    if not raw:
+        bump_content_state()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_page_cache_on_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_content_state()
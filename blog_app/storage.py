@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+# 내용 주소(content-addressed) 저장소, Post.head_image와 file_upload가 사용한다
+# 업로드된 파일을 받으면서 sha256을 계산하고 같은 내용의 파일(blob)은 한 번만 저장한다
+#   blob          : blog_app/cas/ab/ab12...ef.png
+#   필드에 저장되는 이름 : blog_app/cas/ab/ab12...ef.png/스크린샷.png
+# 필드에 저장되는 이름의 마지막 부분은 업로드한 파일 이름이라 get_file_name(), get_file_ext()는 그대로 동작한다
+#
+# blob은 여러 포스트가 함께 쓸 수 있으므로 delete()로 지우지 않는다
+# 아무 포스트도 쓰지 않는 blob은 python manage.py gc_uploads 로 지운다
+# 이 저장소를 쓰기 전에 날짜 경로(blog_app/images/%Y/%m/%d/)로 올린 파일도 그대로 읽을 수 있다
+
+CAS_DIR = 'blog_app/cas'
+TMP_DIR = f'{CAS_DIR}/tmp'
+# FileField의 max_length, 이름이 길면 업로드한 파일 이름을 줄인다
+MAX_NAME_LENGTH = 255
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # 저장할 이름은 내용으로 정해지므로 같은 이름이 있어도 바꾸지 않는다
+        return name
+
+    def _save(self, name, content):
+        digest, tmp_path = self._write_temp(content)
+        filename = os.path.basename(name)
+        stem, ext = os.path.splitext(filename)
+        ext = ext.lower() if len(ext) <= 10 else ''
+        blob_name = f'{CAS_DIR}/{digest[:2]}/{digest}{ext}'
+
+        blob_path = super().path(blob_name)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            # 이미 같은 내용이 있으면 새로 쓰지 않고 수정 시각만 바꾼다
+            # gc_uploads --min-age 는 수정 시각으로 판단하므로, 아직 커밋되지 않은 포스트가 쓰려는 오래된 blob을 지우지 않는다
+            os.utime(blob_path)
+        except FileNotFoundError:
+            os.replace(tmp_path, blob_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(blob_path, self.file_permissions_mode)
+        else:
+            os.remove(tmp_path)
+
+        room = MAX_NAME_LENGTH - len(blob_name) - 1
+        if len(filename) > room:
+            filename = stem[:max(room - len(ext), 1)] + ext
+        return f'{blob_name}/{filename}'
+
+    # 받는 동안 sha256을 계산하면서 임시 파일에 쓴다
+    def _write_temp(self, content):
+        tmp_dir = super().path(TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                sha256.update(chunk)
+                tmp.write(chunk)
+        return sha256.hexdigest(), tmp.name
+
+    # 필드에 저장된 이름에서 실제 파일(blob)의 이름을 구한다, 이전 방식의 이름은 그대로 return
+    @staticmethod
+    def get_blob_name(name):
+        parts = name.split('/')
+        if name.startswith(CAS_DIR + '/') and len(parts) == CAS_DIR.count('/') + 4:
+            return '/'.join(parts[:-1])
+        return name
+
+    def path(self, name):
+        return super().path(self.get_blob_name(name))
+
+    def url(self, name):
+        return super().url(self.get_blob_name(name))
+
+    def delete(self, name):
+        if self.get_blob_name(name) != name:
+            return
+        super().delete(name)
+
+    # gc_uploads 에서 사용, 저장된 모든 blob 이름
+    def iter_blobs(self):
+        root = super().path(CAS_DIR)
+        for dirpath, dirnames, filenames in os.walk(root):
+            relative = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            if relative == 'tmp' or relative.startswith('tmp/'):
+                continue
+            for filename in filenames:
+                yield f'{CAS_DIR}/{relative}/{filename}'
+
+
+upload_storage = ContentAddressedStorage()
+
+
+# FileField(storage=...)에 넘기는 함수, 마이그레이션에는 함수 경로만 남는다
+def get_upload_storage():
+    return upload_storage
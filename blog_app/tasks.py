@@ -0,0 +1,39 @@
+import hashlib
+from .fragments import bump_fragment_versions
+from .images import strip_metadata
+from .jobs import register
+from .models import Post
+from .page_cache import bump_content_state
+
+# 포스트를 저장할 때 Post.enqueue_upload_jobs()가 작업 큐에 넣는 업로드 후처리 작업
+# apps.py의 BlogAppConfig.ready()에서 import 되면서 등록된다
+
+
+# head_image의 위치 정보 같은 메타데이터를 지우고 리사이즈 이미지를 만든다
+@register('post.head_image')
+def process_head_image(post_pk):
+    post = Post.objects.filter(pk=post_pk).first()
+    # 작업을 넣은 뒤 포스트가 삭제되었거나 이미지가 없어졌다면 할 일이 없다
+    if post is None or not post.head_image:
+        return
+    name = strip_metadata(post.head_image)
+    if name != post.head_image.name:
+        post.head_image.name = name
+        Post.objects.filter(pk=post.pk).update(head_image=name)
+    if post.update_head_image_renditions():
+        # update()로 저장해서 시그널이 발생하지 않으므로 캐시된 페이지를 직접 무효화한다
+        bump_fragment_versions([post.pk], 'body')
+        bump_content_state()
+
+
+@register('post.file_checksum')
+def compute_file_checksum(post_pk):
+    post = Post.objects.filter(pk=post_pk).first()
+    if post is None or not post.file_upload:
+        return
+    sha256 = hashlib.sha256()
+    with post.file_upload.storage.open(post.file_upload.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha256.update(chunk)
+    # 계산하는 동안 파일이 바뀌었다면 그 파일의 작업이 다시 계산한다
+    Post.objects.filter(pk=post.pk, file_upload=post.file_upload.name).update(file_upload_sha256=sha256.hexdigest())
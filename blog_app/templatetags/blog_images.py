@@ -0,0 +1,36 @@
+from django import template
+from ..images import RENDITIONS
+
+register = template.Library()
+
+# {% load blog_images %}
+# {% head_image post 'card' 'card-img-top' %}
+# head_image의 리사이즈 이미지로 WebP/JPEG srcset이 들어간 <picture>를 만든다
+# 아직 리사이즈 이미지가 없으면 원본을 그대로 보여준다
+
+
+def get_srcset(storage, files):
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in files)
+
+
+@register.inclusion_tag('blog/head_image.html')
+def head_image(post, kind, css_class='', alt=''):
+    storage = post.head_image.storage
+    manifest = post.head_image_renditions or {}
+    renditions = manifest.get(kind) if manifest.get('source') == post.head_image.name else None
+    context = {'css_class': css_class, 'alt': alt or f'{post.title} head_image'}
+    if not renditions:
+        context['src'] = post.get_head_image_url()
+        return context
+    jpeg = renditions['jpeg']
+    # src는 srcset을 모르는 브라우저용, 카드 폭에 맞는 800px(없으면 가장 큰 것)을 쓴다
+    _, name = next((item for item in jpeg if item[0] == 800), jpeg[-1])
+    context.update({
+        'src': storage.url(name),
+        'webp_srcset': get_srcset(storage, renditions['webp']),
+        'jpeg_srcset': get_srcset(storage, jpeg),
+        'sizes': RENDITIONS[kind]['sizes'],
+        # 목록의 카드 이미지는 화면에 보일 때 받는다, 상세 페이지 이미지는 바로 보이므로 바로 받는다
+        'lazy': kind == 'card',
+    })
+    return context
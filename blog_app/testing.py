@@ -0,0 +1,59 @@
+import re
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# 테스트용 도우미, 페이지의 쿼리 수가 데이터 양에 따라 늘어나지 않는지(N+1이 없는지) 확인한다
+#
+# class TestView(QueryScalingMixin, TestCase):
+#     def test_post_list_query_scaling(self):
+#         self.assertQueriesDoNotScale('/blog/', self.add_posts)
+#
+# populate(n)은 데이터를 n개 더 만드는 함수, sizes의 크기가 될 때까지 조금씩 늘리면서 페이지를 요청하고
+# 크기별 쿼리 수가 slack보다 많이 차이 나면 실패한다, 실패 메시지에 크기별 쿼리 수, SQL 시간과 반복된 SQL이 나온다
+# 요청마다 캐시(페이지, 조각, 사이드바)를 비우므로 캐시가 없을 때의 쿼리 수를 잰다
+
+# SQL의 숫자와 문자열 값을 ? 로 바꾼다, 값만 다른 같은 쿼리(N+1)를 한데 센다
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalize_sql(sql):
+    return LITERAL_RE.sub('?', sql)
+
+
+class QueryScalingMixin:
+    scaling_sizes = (1, 5, 15)
+
+    def clear_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    # 페이지를 한 번 요청하고 (쿼리 수, SQL 시간 ms, 실행된 SQL 목록)을 return
+    def measure_queries(self, url):
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        sql_ms = sum(float(query['time']) for query in context.captured_queries) * 1000
+        return len(context), sql_ms, [query['sql'] for query in context.captured_queries]
+
+    def assertQueriesDoNotScale(self, url, populate, sizes=None, slack=0):
+        sizes = sizes or self.scaling_sizes
+        rows = []
+        created = 0
+        for size in sizes:
+            populate(size - created)
+            created = size
+            # url이 함수면 데이터를 만든 뒤에 구한다(가장 최근 포스트 등)
+            count, sql_ms, queries = self.measure_queries(url() if callable(url) else url)
+            rows.append((size, count, sql_ms, queries))
+
+        counts = [count for _, count, _, _ in rows]
+        if max(counts) - min(counts) <= slack:
+            return rows
+        lines = [f'{size:>6} rows: {count} queries, {sql_ms:.2f}ms SQL' for size, count, sql_ms, _ in rows]
+        repeated = Counter(normalize_sql(sql) for sql in rows[-1][3]).most_common(3)
+        lines += [f'  x{times} {sql[:200]}' for sql, times in repeated if times > 1]
+        self.fail('query count grows with the number of rows:\n' + '\n'.join(lines))
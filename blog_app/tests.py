@@ -1,14 +1,55 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncClient
 from bs4 import BeautifulSoup
 from django.contrib.auth.models import User
-from .models import Post, Category
+from django.core.management import call_command, CommandError
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+from urllib.parse import quote
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings, RequestFactory
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.urls import path
+import asyncio
+import base64
+from asgiref.sync import async_to_sync
+import time
+import json
+import gzip
+from unittest import mock
+from blog.db.routers import ReadWriteRouter
+from markdownx.utils import markdown
+from .models import Post, Category, Tag, Comment, CategoryPostCount, Job, get_content_hash
+from .jobs import register, run_pending_jobs
+from . import async_views
+from .page_cache import anonymous_page_cache
+from .fragments import get_fragment_versions
+from .testing import QueryScalingMixin
+from .management.commands.explain_hot_queries import get_hot_queries
+from single_pages_app.views import landing_async
 
 # Create your tests here.
 
+# test_instrumentation_asgi_concurrency에서 쓰는 URLconf, 0.3초 기다리는 비동기 뷰
+async def slow_async_view(request):
+    await asyncio.sleep(0.3)
+    return HttpResponse('ok')
+
+urlpatterns = [path('slow/', slow_async_view)]
+
 #pip install beautifulsoup4
 # html로 나타나는 페이지의 요소를 쉽게 다루게해주는 라이브러리
-class TestView(TestCase):
+class TestView(QueryScalingMixin, TestCase):
     def setUp(self):
+        # 사이드바 등 캐시된 값이 이전 테스트에서 남아있지 않도록 비운다
+        cache.clear()
         self.client = Client()
         self.user_trump = User.objects.create_user(username = 'trump', password='somepassword')
         self.user_obama = User.objects.create_user(username = 'obama', password='somepassword')
@@ -197,4 +238,872 @@ class TestView(TestCase):
         # 2.6 첫 번째 포스트의 내용(content)이 포스트 영역에 있다
         self.assertIn(self.post_001.content, post_area.text)
 
-    
\ No newline at end of file
+    
+    def test_content_markdown_cache(self):
+        # 저장할 때 렌더링된 html과 해시가 함께 저장된다
+        self.assertEqual(self.post_001.content_html, markdown(self.post_001.content))
+        self.assertEqual(self.post_001.content_hash, get_content_hash(self.post_001.content))
+        self.assertEqual(self.post_001.get_content_markdown(), self.post_001.content_html)
+
+        # content가 바뀌면 다시 렌더링된다
+        self.post_001.content = '# 제목이 바뀌었습니다'
+        self.post_001.save()
+        self.post_001.refresh_from_db()
+        self.assertIn('<h1>제목이 바뀌었습니다</h1>', self.post_001.content_html)
+
+        # 저장된 html이 없는 포스트는 render_content 명령으로 채울 수 있다
+        Post.objects.update(content_html='', content_hash='')
+        call_command('render_content', stdout=StringIO())
+        self.post_002.refresh_from_db()
+        self.assertEqual(self.post_002.content_html, markdown(self.post_002.content))
+
+    def test_post_excerpt(self):
+        # excerpt는 저장할 때 45단어로 잘라서 만들어진다
+        self.post_001.content = ' '.join(f'word{i}' for i in range(100))
+        self.post_001.save()
+        self.assertIn('word44', self.post_001.excerpt)
+        self.assertNotIn('word45', self.post_001.excerpt)
+
+        # 목록 페이지에는 content 전체가 아니라 excerpt가 보인다
+        response = self.client.get('/blog/')
+        soup = BeautifulSoup(response.content, 'html.parser')
+        post_001_card = soup.find('div', id='post-1')
+        self.assertIn('word44', post_001_card.text)
+        self.assertNotIn('word45', post_001_card.text)
+
+    def test_post_list_query_count(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        tag_django = Tag.objects.create(name='django', slug='django')
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        for post in Post.objects.all():
+            post.tags.add(tag_python, tag_django)
+        urls = ['/blog/', self.category_programming.get_absolute_url(), tag_python.get_absolute_url(), '/blog/search/포스트/']
+        before = [count_queries(url) for url in urls]
+
+        # 포스트가 늘어나도 목록 페이지의 쿼리 수는 그대로여야 한다
+        for i in range(10):
+            post = Post.objects.create(
+                title=f'추가 포스트 {i}',
+                content='N+1 테스트',
+                category=self.category_programming,
+                author=self.user_trump,
+            )
+            post.tags.add(tag_python, tag_django)
+        after = [count_queries(url) for url in urls]
+
+        self.assertEqual(before, after)
+
+    def test_category_post_count(self):
+        def counts():
+            categories, no_category_post_count = CategoryPostCount.sidebar()
+            return {c.slug: c.counter.count for c in categories}, no_category_post_count
+
+        self.assertEqual(counts(), ({'programming': 1, 'music': 1}, 1))
+
+        # 카테고리 변경
+        post = Post.objects.get(pk=self.post_002.pk)
+        post.category = self.category_programming
+        post.save()
+        self.assertEqual(counts(), ({'programming': 2, 'music': 0}, 1))
+
+        # 포스트 삭제, 카테고리 삭제
+        post.delete()
+        self.category_programming.delete()
+        self.assertEqual(counts(), ({'music': 0}, 2))
+
+        # 어긋난 숫자는 recount_categories 명령으로 다시 맞춘다
+        CategoryPostCount.objects.update(count=100)
+        call_command('recount_categories', stdout=StringIO())
+        self.assertEqual(counts(), ({'music': 0}, 2))
+
+        # 사이드바는 쿼리 한 번으로 만들어진다
+        with self.assertNumQueries(1):
+            counts()
+
+    def test_sidebar_cache(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        self.post_003.tags.add(tag_python)
+
+        # 태그 페이지에서도 미분류 포스트 수가 보인다
+        response = self.client.get(tag_python.get_absolute_url())
+        soup = BeautifulSoup(response.content, 'html.parser')
+        self.category_card_test(soup)
+
+        # 두번째 요청부터는 사이드바를 캐시에서 가져온다
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(tag_python.get_absolute_url())
+        self.assertFalse([q for q in queries if 'blog_app_categorypostcount' in q['sql']])
+
+        # 포스트가 추가되면 캐시가 지워진다
+        Post.objects.create(title='미분류 포스트', content='...', author=self.user_trump)
+        response = self.client.get(tag_python.get_absolute_url())
+        soup = BeautifulSoup(response.content, 'html.parser')
+        self.assertIn('미분류 (2)', soup.find('div', id='categories-card').text)
+
+    def test_post_list_cursor_pagination(self):
+        for i in range(9):
+            Post.objects.create(title=f'추가 포스트 {i}', content='...', author=self.user_trump)
+        all_pks = list(Post.objects.order_by('-pk').values_list('pk', flat=True))
+
+        def get_page(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'blog_app_post' in q['sql']])
+            soup = BeautifulSoup(response.content, 'html.parser')
+            pks = [int(card['id'].split('-')[1]) for card in soup.find_all('div', id=lambda x: x and x.startswith('post-'))]
+            links = {a.text.strip(): a['href'] for a in soup.find_all('a', class_='page-link') if a['href'] != '#'}
+            return pks, links
+
+        # 12개의 포스트가 5, 5, 2개씩 나뉜다
+        pks, links = get_page('/blog/')
+        self.assertEqual(pks, all_pks[:5])
+        self.assertNotIn('Newer →', links)
+        pks, links = get_page('/blog/' + links['← Older'])
+        self.assertEqual(pks, all_pks[5:10])
+        pks, links = get_page('/blog/' + links['← Older'])
+        self.assertEqual(pks, all_pks[10:])
+        self.assertNotIn('← Older', links)
+
+        # 이전 페이지로 돌아갈 수 있다
+        pks, links = get_page('/blog/' + links['Newer →'])
+        self.assertEqual(pks, all_pks[5:10])
+
+        # 잘못된 커서는 404
+        self.assertEqual(self.client.get('/blog/?cursor=invalid').status_code, 404)
+        # 올바르게 인코딩되었지만 값이 맞지 않는 커서도 404, 댓글 페이지도 같다
+        for value in (['abc'], [None], [[1]], [1, 2], 'abc'):
+            cursor = base64.urlsafe_b64encode(json.dumps(['next', value]).encode()).decode()
+            for url in ('/blog/', f'{self.post_001.get_absolute_url()}comments/'):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404, (url, value))
+
+        # 미분류 카테고리 페이지도 같은 방법으로 나뉜다
+        pks, links = get_page('/blog/category/no_category/')
+        self.assertEqual(len(pks), 5)
+        self.assertIn('← Older', links)
+
+    def test_post_search(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        self.post_002.tags.add(tag_python)
+        self.post_003.hook_text = '파이썬 이야기'
+        self.post_003.save()
+
+        def search(q):
+            response = self.client.get(f'/blog/search/{q}/')
+            self.assertEqual(response.status_code, 200)
+            soup = BeautifulSoup(response.content, 'html.parser')
+            main_area = soup.find('div', id='main-area')
+            cards = main_area.find_all('div', id=lambda x: x and x.startswith('post-'))
+            return [int(card['id'].split('-')[1]) for card in cards], main_area
+
+        # 제목, 본문, hook_text, 태그 이름으로 찾을 수 있다
+        self.assertEqual(sorted(search('포스트')[0]), [1, 2, 3])
+        self.assertEqual(search('World')[0], [self.post_001.pk])
+        self.assertEqual(search('파이썬')[0], [self.post_003.pk])
+        self.assertEqual(search('python')[0], [self.post_002.pk])
+
+        # 검색어는 <mark>로 강조된다
+        pks, main_area = search('world')
+        self.assertEqual(main_area.find('mark').text.lower(), 'world')
+        self.assertIn('Search: world (1)', main_area.text)
+
+        # 태그 이름이 바뀌거나 포스트가 삭제되면 인덱스도 바뀐다
+        tag_python.name = 'django'
+        tag_python.save()
+        self.assertEqual(search('python')[0], [])
+        self.assertEqual(search('django')[0], [self.post_002.pk])
+        self.post_002.delete()
+        self.assertEqual(search('django')[0], [])
+
+    def test_post_search_pagination_and_cache(self):
+        for i in range(5):
+            Post.objects.create(title=f'추가 포스트 {i}', content='...', author=self.user_trump)
+
+        def search(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            soup = BeautifulSoup(response.content, 'html.parser')
+            main_area = soup.find('div', id='main-area')
+            cards = main_area.find_all('div', id=lambda x: x and x.startswith('post-'))
+            links = {a.text.strip(): a['href'] for a in soup.find_all('a', class_='page-link') if a['href'] != '#'}
+            fts_queries = [q for q in queries if 'blog_app_post_fts' in q['sql']]
+            return len(cards), links, main_area, fts_queries
+
+        # 8개의 검색 결과가 5개, 3개로 나뉘고 결과 수는 전체 개수로 보인다
+        count, links, main_area, fts_queries = search('/blog/search/포스트/')
+        self.assertEqual(count, 5)
+        self.assertIn('Search: 포스트 (8)', main_area.text)
+        self.assertEqual(len(fts_queries), 1)
+
+        # 같은 검색어는 인덱스를 다시 조회하지 않는다
+        count, links, main_area, fts_queries = search('/blog/search/포스트/' + links['← Older'])
+        self.assertEqual(count, 3)
+        self.assertNotIn('← Older', links)
+        self.assertEqual(fts_queries, [])
+        count, links, main_area, fts_queries = search('/blog/search/포스트/' + links['Newer →'])
+        self.assertEqual(count, 5)
+        self.assertEqual(self.client.get('/blog/search/포스트/?cursor=invalid').status_code, 404)
+
+        # 결과가 SEARCH_LIMIT개까지만 나오면 결과 수를 '5+'처럼 보여준다
+        cache.clear()
+        with mock.patch('blog_app.search.SEARCH_LIMIT', 5):
+            count, links, main_area, fts_queries = search('/blog/search/추가/')
+        self.assertIn('Search: 추가 (5+)', main_area.text)
+
+        # 'search' 캐시가 없으면 'default'를 함께 쓰지만, 인덱스가 바뀌어도 'default'를 비우지 않는다
+        search_caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'only-default'}}
+        with override_settings(CACHES=search_caches):
+            caches['default'].set('unrelated', 1)
+            search('/blog/search/추가/')
+            Post.objects.create(title='추가 포스트 새로', content='...', author=self.user_trump)
+            count, links, main_area, fts_queries = search('/blog/search/추가/')
+            self.assertIn('Search: 추가 (6)', main_area.text)
+            self.assertEqual(caches['default'].get('unrelated'), 1)
+
+    def test_post_tags_str(self):
+        self.user_trump.is_staff = True
+        self.user_trump.save()
+        self.client.login(username='trump', password='somepassword')
+
+        def create_post(title, tags_str):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/blog/create_post/', {
+                    'title': title,
+                    'content': '태그 테스트',
+                    'tags_str': tags_str,
+                })
+            self.assertEqual(response.status_code, 302)
+            return Post.objects.get(title=title), len(queries)
+
+        # 태그 수와 상관없이 쿼리 수가 같다
+        post, few_queries = create_post('태그 2개', 'python; django')
+        post, many_queries = create_post('태그 20개', '; '.join(f'tag{i}' for i in range(20)))
+        self.assertEqual(post.tags.count(), 20)
+        self.assertEqual(few_queries, many_queries)
+
+        # 중복, 빈 값, 대소문자만 다른 이름은 하나로 처리된다
+        post, _ = create_post('중복 태그', 'Python, python ; ; 장고, django')
+        self.assertEqual(sorted(post.tags.values_list('name', flat=True)), ['django', 'python', '장고'])
+        self.assertEqual(Tag.objects.filter(slug='python').count(), 1)
+
+        # slug가 같아도 이름이 다르면 다른 태그이고, 겹치지 않는 slug를 만든다
+        Tag.objects.create(name='C', slug='c')
+        c_post, _ = create_post('C 태그', 'C++, C#, c')
+        self.assertEqual(sorted(c_post.tags.values_list('name', 'slug')), [('C', 'c'), ('C#', 'c-3'), ('C++', 'c-2')])
+        c_post, _ = create_post('C 태그 다시', 'c++')
+        self.assertEqual(list(c_post.tags.values_list('name', flat=True)), ['C++'])
+
+        # 수정할 때는 바뀐 태그만 추가/삭제되고 그대로인 태그의 연결은 유지된다
+        through = Post.tags.through
+        kept = through.objects.get(post=post, tag__slug='python').pk
+        response = self.client.post(f'/blog/update_post/{post.pk}/', {
+            'title': post.title,
+            'content': post.content,
+            'tags_str': 'python; 새태그',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(post.tags.values_list('name', flat=True)), ['python', '새태그'])
+        self.assertEqual(through.objects.get(post=post, tag__slug='python').pk, kept)
+
+    def test_avatar_query_count(self):
+        def count_queries(url):
+            # 조각 캐시 없이 렌더링할 때의 쿼리 수를 비교한다
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        Comment.objects.create(post=self.post_001, author=self.user_obama, content='첫 댓글')
+        before = [count_queries(self.post_001.get_absolute_url()), count_queries('/')]
+
+        # 댓글 작성자가 늘어나도 아바타 때문에 쿼리가 늘어나지 않는다
+        for i in range(10):
+            user = User.objects.create_user(username=f'user{i}', password='somepassword')
+            Comment.objects.create(post=self.post_001, author=user, content=f'댓글 {i}')
+            Post.objects.create(title=f'포스트 {i}', content='...', author=user)
+        after = [count_queries(self.post_001.get_absolute_url()), count_queries('/')]
+
+        self.assertEqual(before, after)
+
+    def test_post_detail_comment_pages(self):
+        for i in range(45):
+            user = User.objects.create_user(username=f'user{i}', password='somepassword')
+            Comment.objects.create(post=self.post_001, author=user, content=f'댓글 {i}')
+        comment_pks = list(Comment.objects.order_by('created_at', 'pk').values_list('pk', flat=True))
+
+        def get_comments(soup):
+            return [int(c['id'].split('-')[1]) for c in soup.find_all('div', id=lambda x: x and x.startswith('comment-') and x[8:].isdigit())]
+
+        # 상세 페이지에는 첫 20개의 댓글만 보인다
+        response = self.client.get(self.post_001.get_absolute_url())
+        soup = BeautifulSoup(response.content, 'html.parser')
+        self.assertEqual(get_comments(soup), comment_pks[:20])
+
+        # 나머지는 '댓글 더 보기' 버튼의 url로 가져온다
+        more_url = soup.find('div', class_='comment-more').button['data-url']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(more_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 10)
+        soup = BeautifulSoup(response.content, 'html.parser')
+        self.assertEqual(get_comments(soup), comment_pks[20:40])
+
+        more_url = soup.find('div', class_='comment-more').button['data-url']
+        soup = BeautifulSoup(self.client.get(more_url).content, 'html.parser')
+        self.assertEqual(get_comments(soup), comment_pks[40:])
+        self.assertIsNone(soup.find('div', class_='comment-more'))
+
+        # 상세 페이지는 ?cursor= 가 있어도 첫 페이지를 보여주고, 다음 요청에 다른 페이지가 캐시되지 않는다
+        cursor = more_url.split('cursor=')[1]
+        self.clear_caches()
+        for url in (f'{self.post_001.get_absolute_url()}?cursor={cursor}', self.post_001.get_absolute_url()):
+            soup = BeautifulSoup(self.client.get(url).content, 'html.parser')
+            self.assertEqual(get_comments(soup), comment_pks[:20])
+
+    def test_post_detail_fragment_cache(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        self.post_001.tags.add(tag_python)
+        Comment.objects.create(post=self.post_001, author=self.user_obama, content='첫 댓글')
+
+        def get_detail():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.post_001.get_absolute_url())
+            soup = BeautifulSoup(response.content, 'html.parser')
+            return soup, [q['sql'] for q in queries]
+
+        soup, first = get_detail()
+        soup, second = get_detail()
+        # 두번째 요청에서는 태그와 댓글 조각을 캐시에서 가져온다
+        self.assertLess(len(second), len(first))
+        self.assertFalse([sql for sql in second if 'blog_app_comment' in sql or 'blog_app_tag' in sql])
+
+        # 태그, 댓글, 본문이 바뀌면 바로 보인다
+        tag_python.name = 'django'
+        tag_python.save()
+        Comment.objects.create(post=self.post_001, author=self.user_trump, content='두번째 댓글')
+        self.post_001.content = '내용이 바뀌었습니다'
+        self.post_001.save()
+        soup, _ = get_detail()
+        post_area = soup.find('div', id='post-area')
+        self.assertIn('django', post_area.text)
+        self.assertIn('내용이 바뀌었습니다', post_area.text)
+        self.assertIn('두번째 댓글', soup.find('div', id='comment-list').text)
+
+        # 캐시된 댓글 조각은 사용자와 상관없이 같고, 수정 버튼은 작성자에게만 보이도록 스크립트가 처리한다
+        self.client.login(username='obama', password='somepassword')
+        soup, _ = get_detail()
+        self.assertTrue(soup.find('div', class_='comment-controls', attrs={'data-author': str(self.user_obama.pk)}))
+        scripts = ' '.join(script.string or '' for script in soup.find_all('script'))
+        self.assertIn(f'.comment-controls[data-author="{self.user_obama.pk}"]', scripts)
+
+    def test_anonymous_page_cache(self):
+        url = self.post_001.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        # 같은 페이지를 다시 요청하면 템플릿을 렌더링하지 않고 캐시된 HTML을 돌려준다
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response['ETag'], etag)
+
+        # 브라우저가 가진 페이지가 최신이면 304
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        # 댓글이 달리면 ETag가 바뀌고 새 댓글이 보인다
+        Comment.objects.create(post=self.post_001, author=self.user_trump, content='새 댓글')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('새 댓글', response.content.decode('utf-8'))
+
+        # 포스트가 삭제되면 목록 페이지도 바뀐다
+        response = self.client.get('/blog/')
+        self.assertIn(self.post_003.title, response.content.decode('utf-8'))
+        self.post_003.delete()
+        response = self.client.get('/blog/')
+        self.assertNotIn(self.post_003.title, response.content.decode('utf-8'))
+
+        # 뷰가 읽지 않는 쿼리 파라미터가 붙은 요청은 캐시하지 않는다
+        for other_url in ('/blog/?x=1', '/blog/?cursor=&x=2', f'{url}?cursor=abc'):
+            self.client.get(other_url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(other_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertGreater(len(queries), 0)
+        # 뷰가 읽는 파라미터는 순서와 상관없이 같은 캐시를 쓴다
+        list_etag = self.client.get('/blog/?q=a&cursor=')['ETag']
+        self.assertEqual(self.client.get('/blog/?cursor=&q=a')['ETag'], list_etag)
+
+        # 로그인한 사용자는 매번 렌더링하고 ETag를 받지 않는다
+        self.client.login(username='obama', password='somepassword')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_head_image_renditions(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010f] = 'camera'
+        Image.effect_noise((1600, 900), 64).convert('RGB').save(buffer, 'PNG', exif=exif.tobytes())
+
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                title='이미지 포스트', content='이미지가 있는 포스트', author=self.user_trump,
+                head_image=SimpleUploadedFile('head.png', buffer.getvalue(), content_type='image/png'),
+            )
+            # 리사이즈 이미지는 요청 안에서 만들지 않고 작업 큐에 넣는다
+            self.assertEqual(Post.objects.get(pk=post.pk).head_image_renditions, {})
+            self.assertEqual(Job.objects.filter(name='post.head_image', status=Job.PENDING).count(), 1)
+            call_command('run_jobs', '--once', stdout=StringIO())
+
+            post = Post.objects.get(pk=post.pk)
+            manifest = post.head_image_renditions
+            self.assertEqual(manifest['source'], post.head_image.name)
+            self.assertFalse(Image.open(post.head_image.path).getexif())
+            self.assertEqual([width for width, _ in manifest['card']['webp']], [400, 800, 1200])
+            # 카드 이미지는 4:1로 잘리고 원본보다 훨씬 작다
+            card = post.head_image.storage.path(manifest['card']['jpeg'][1][1])
+            self.assertEqual(Image.open(card).size, (800, 200))
+            self.assertLess(post.head_image.storage.size(manifest['card']['webp'][1][1]) * 10, post.head_image.size)
+
+            response = self.client.get('/blog/')
+            soup = BeautifulSoup(response.content, 'html.parser')
+            picture = soup.find('div', id=f'post-{post.pk}').find('picture')
+            self.assertEqual(picture.source['type'], 'image/webp')
+            self.assertIn('800w', picture.img['srcset'])
+
+            # 이미지를 지우면 쓰지 않게 된 리사이즈 이미지는 gc_uploads가 지운다
+            post.head_image = None
+            post.save()
+            self.assertEqual(post.head_image_renditions, {})
+            call_command('gc_uploads', '--min-age', '0', stdout=StringIO())
+            self.assertFalse(post.head_image.storage.exists(manifest['card']['jpeg'][1][1]))
+
+    def test_job_queue(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                title='파일 포스트', content='파일이 있는 포스트', author=self.user_trump,
+                file_upload=SimpleUploadedFile('readme.txt', b'hello'),
+            )
+            # 다시 저장해도 파일이 그대로면 작업을 또 넣지 않는다
+            post.save()
+            self.assertEqual(Job.objects.filter(name='post.file_checksum').count(), 1)
+            run_pending_jobs()
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).file_upload_sha256,
+            '2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824',
+        )
+        self.assertEqual(Job.objects.get(name='post.file_checksum').status, Job.DONE)
+
+        # 실패한 작업은 시간을 두고 다시 시도하고, max_attempts번 실패하면 failed가 된다
+        calls = []
+
+        @register('test.always_fail')
+        def always_fail(n):
+            calls.append(n)
+            raise ValueError('실패')
+
+        job = Job.enqueue('test.always_fail', max_attempts=2, n=1)
+        [job] = run_pending_jobs()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('ValueError', job.last_error)
+        self.assertEqual(run_pending_jobs(), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        [job] = run_pending_jobs()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(calls, [1, 1])
+
+        out = StringIO()
+        call_command('run_jobs', '--status', stdout=out)
+        self.assertIn('failed: 1', out.getvalue())
+
+    def test_download_file(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        data = bytes(range(256)) * 40
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                title='다운로드', content='첨부 파일', author=self.user_trump,
+                file_upload=SimpleUploadedFile('데이터.bin', data),
+            )
+            run_pending_jobs()
+            url = post.get_download_url()
+
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), data)
+            self.assertEqual(response['Content-Length'], str(len(data)))
+            self.assertEqual(response['Accept-Ranges'], 'bytes')
+            self.assertIn("attachment; filename*=utf-8''", response['Content-Disposition'])
+            # 체크섬 작업이 끝났으면 ETag는 파일 내용의 sha256
+            etag = response['ETag']
+            self.assertEqual(etag, f'"{Post.objects.get(pk=post.pk).file_upload_sha256}"')
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            # 이어받기
+            response = self.client.get(url, HTTP_RANGE='bytes=100-199')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(data)}')
+            self.assertEqual(b''.join(response.streaming_content), data[100:200])
+            response = self.client.get(url, HTTP_RANGE='bytes=-10')
+            self.assertEqual(b''.join(response.streaming_content), data[-10:])
+            response = self.client.get(url, HTTP_RANGE=f'bytes={len(data)}-')
+            self.assertEqual(response.status_code, 416)
+            # 파일이 바뀌었다면(If-Range가 다르면) 전체를 보낸다
+            response = self.client.get(url, HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE='"old"')
+            self.assertEqual(response.status_code, 200)
+
+            # 앞단 웹 서버(nginx)에 전송을 맡기는 경우
+            with override_settings(BLOG_SENDFILE='x-accel-redirect', BLOG_SENDFILE_URL='/protected-media/'):
+                response = self.client.get(url)
+            blob_name = post.file_upload.storage.get_blob_name(post.file_upload.name)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + quote(blob_name))
+            self.assertEqual(response.content, b'')
+
+            soup = BeautifulSoup(self.client.get(post.get_absolute_url()).content, 'html.parser')
+            self.assertTrue(soup.find('a', href=url))
+
+            # 디스크에서 지워진 파일은 404
+            os.remove(post.file_upload.path)
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_upload_storage_dedup(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            post_a = Post.objects.create(
+                title='첫번째', content='같은 파일', author=self.user_trump,
+                file_upload=SimpleUploadedFile('report.csv', b'a,b,c\n1,2,3\n'),
+            )
+            # 오래된 blob도 같은 내용이 다시 올라오면 수정 시각이 바뀌어 gc_uploads --min-age 가 지우지 않는다
+            blob_path = post_a.file_upload.path
+            os.utime(blob_path, (time.time() - 7200, time.time() - 7200))
+            post_b = Post.objects.create(
+                title='두번째', content='같은 파일', author=self.user_trump,
+                file_upload=SimpleUploadedFile('보고서.CSV', b'a,b,c\n1,2,3\n'),
+            )
+            storage = post_a.file_upload.storage
+            # 같은 내용은 한 번만 저장하고, 업로드한 파일 이름은 그대로 남는다
+            self.assertEqual(post_a.get_file_name(), 'report.csv')
+            self.assertEqual(post_b.get_file_name(), '보고서.CSV')
+            self.assertEqual(storage.path(post_a.file_upload.name), storage.path(post_b.file_upload.name))
+            self.assertEqual(len(list(storage.iter_blobs())), 1)
+            self.assertGreater(os.path.getmtime(blob_path), time.time() - 60)
+            with storage.open(post_b.file_upload.name) as f:
+                self.assertEqual(f.read(), b'a,b,c\n1,2,3\n')
+
+            # 다른 포스트가 쓰고 있는 동안은 지우지 않는다
+            post_a.delete()
+            call_command('gc_uploads', '--min-age', '0', stdout=StringIO())
+            self.assertTrue(storage.exists(post_b.file_upload.name))
+            post_b.delete()
+            call_command('gc_uploads', '--min-age', '0', stdout=StringIO())
+            self.assertEqual(list(storage.iter_blobs()), [])
+
+    @override_settings(BLOG_ASYNC_PARALLEL_QUERIES=False)
+    def test_async_views(self):
+        self.post_001.tags.add(Tag.objects.create(name='hello', slug='hello'))
+        factory = RequestFactory()
+
+        def get(view, path, *args):
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            return async_to_sync(view)(request, *args)
+
+        def cards(content):
+            soup = BeautifulSoup(content, 'html.parser')
+            return [card['id'] for card in soup.select('#main-area .card[id^="post-"]')], \
+                soup.find('div', id='categories-card').text
+
+        # 비동기 뷰는 동기 뷰와 같은 페이지를 만든다
+        for view, path, args in (
+            (async_views.post_list, '/blog/', ()),
+            (async_views.category_page, '/blog/category/programming/', ('programming',)),
+            (async_views.category_page, '/blog/category/no_category/', ('no_category',)),
+            (async_views.tag_page, '/blog/tag/hello/', ('hello',)),
+        ):
+            response = get(view, path, *args)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(cards(response.content), cards(self.client.get(path).content))
+
+        response = get(async_views.post_detail, self.post_001.get_absolute_url(), self.post_001.pk)
+        soup = BeautifulSoup(response.content, 'html.parser')
+        self.assertIn(self.post_001.title, soup.find('div', id='post-area').text)
+        with self.assertRaises(Http404):
+            get(async_views.tag_page, '/blog/tag/none/', 'none')
+        response = get(landing_async, '/')
+        self.assertIn(self.post_003.title, response.content.decode('utf-8'))
+
+        # 비동기 뷰에도 로그인하지 않은 사용자의 페이지 캐시를 쓸 수 있다
+        cached_view = anonymous_page_cache(async_views.post_list)
+        etag = get(cached_view, '/blog/')['ETag']
+        request = factory.get('/blog/', HTTP_IF_NONE_MATCH=etag)
+        request.user = AnonymousUser()
+        self.assertEqual(async_to_sync(cached_view)(request).status_code, 304)
+
+    def test_async_run_queries_in_parallel(self):
+        started = time.monotonic()
+        results = async_to_sync(async_views.run_queries)(
+            lambda: time.sleep(0.3) or 'a',
+            lambda: time.sleep(0.3) or 'b',
+        )
+        self.assertEqual(results, ['a', 'b'])
+        self.assertLess(time.monotonic() - started, 0.55)
+
+    def test_sqlite_backend_and_router(self):
+        # blog.db.sqlite3 백엔드는 연결할 때 PRAGMA를 설정한다
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+        # 트랜잭션 밖의 읽기는 'read', 쓰기와 트랜잭션 안의 읽기는 'default'
+        router = ReadWriteRouter()
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')  # TestCase는 트랜잭션 안에서 실행된다
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Post), 'read')
+        self.assertFalse(router.allow_migrate('read', 'blog_app'))
+
+    def test_request_instrumentation(self):
+        # 저장된 html이 없는 포스트는 상세 페이지에서 마크다운을 렌더링한다
+        Post.objects.filter(pk=self.post_001.pk).update(content_hash='')
+        response = self.client.get(self.post_001.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('queries"', timing)
+        self.assertIn('template;dur=', timing)
+        self.assertIn('markdown;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        # 쿼리가 기준보다 많으면 가장 느린 SQL과 반복된 SQL을 JSON으로 남긴다
+        with override_settings(BLOG_SLOW_REQUEST_QUERIES=1):
+            with self.assertLogs('blog_app.slow_requests', 'WARNING') as logs:
+                self.client.get('/blog/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/blog/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreaterEqual(record['queries'], 1)
+        self.assertTrue(record['worst_sql'])
+        self.assertIn('template', record['timings_ms'])
+
+        with override_settings(BLOG_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/blog/'))
+
+    @override_settings(ROOT_URLCONF='blog_app.tests')
+    def test_instrumentation_asgi_concurrency(self):
+        # ASGI에서 InstrumentationMiddleware가 요청들을 한 스레드에서 차례로 실행하지 않는다
+        async def get_many():
+            client = AsyncClient()
+            return await asyncio.gather(*(client.get('/slow/') for _ in range(4)))
+
+        started = time.monotonic()
+        responses = async_to_sync(get_many)()
+        self.assertLess(time.monotonic() - started, 0.9)
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_generate_data_and_benchmark_views(self):
+        # 만들 포스트의 pk에 남아 있던 조각 캐시 버전은 쓰이지 않는다
+        first_pk = Post.objects.order_by('-pk')[0].pk + 1
+        stale_versions = get_fragment_versions(first_pk)
+        call_command('generate_blog_data', posts=30, categories=3, tags=10, users=3, comments=3, paragraphs=2, stdout=StringIO())
+        self.assertEqual(Post.objects.filter(author__username__startswith='bench_').count(), 30)
+        post = Post.objects.filter(author__username__startswith='bench_').first()
+        self.assertEqual(post.pk, first_pk)
+        self.assertFalse(set(stale_versions.values()) & set(get_fragment_versions(first_pk).values()))
+        self.assertTrue(post.content_html)
+        self.assertTrue(post.tags.exists())
+        self.assertEqual(Category.objects.get(slug='bench-category-0-django').counter.count,
+                         Post.objects.filter(category__slug='bench-category-0-django').count())
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        output = f'{tmp_dir}/bench.json'
+        call_command('benchmark_views', iterations=2, warmup=0, output=output, stdout=StringIO())
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(report['dataset']['posts'], 33)
+        for name in ('landing', 'post_list', 'post_detail', 'category_page', 'tag_page', 'search'):
+            self.assertGreater(report['results'][name]['queries'], 0)
+            self.assertGreater(report['results'][name]['alloc_peak_kb'], 0)
+
+        # 기준보다 쿼리가 늘었거나 많이 느려진 페이지가 있으면 실패한다
+        for result in report['results'].values():
+            result['queries'] -= 1
+        with open(output, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaises(CommandError):
+            call_command('benchmark_views', iterations=1, warmup=0, baseline=output, stdout=StringIO(), stderr=StringIO())
+
+    # 작성자, 카테고리, 태그가 모두 다른 포스트를 n개씩 더 만든다(미분류 포스트도 같은 수만큼)
+    def add_posts(self, n):
+        tag_python, _ = Tag.objects.get_or_create(name='python', slug='python')
+        for i in range(n):
+            index = Post.objects.count()
+            user = User.objects.create(username=f'author{index}')
+            tag = Tag.objects.create(name=f'tag{index}', slug=f'tag{index}')
+            for category in (self.category_programming, None):
+                post = Post.objects.create(title=f'추가 포스트 {index}', content='N+1 테스트', category=category, author=user)
+                post.tags.add(tag_python, tag)
+                Comment.objects.create(post=post, author=user, content='댓글')
+
+    def test_list_pages_query_scaling(self):
+        urls = {
+            'post_list': '/blog/',
+            'category_page': self.category_programming.get_absolute_url(),
+            'no_category_page': '/blog/category/no_category/',
+            'tag_page': '/blog/tag/python/',
+            'search': '/blog/search/포스트/',
+            'landing': '/',
+        }
+        for name, url in urls.items():
+            with self.subTest(name):
+                self.assertQueriesDoNotScale(url, self.add_posts)
+
+    def test_post_detail_query_scaling(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        self.post_001.tags.add(tag_python)
+
+        # 서로 다른 사용자의 댓글과 태그가 늘어나도 상세 페이지와 댓글 더 보기의 쿼리 수는 그대로여야 한다
+        def add_comments(n):
+            for i in range(n):
+                index = Comment.objects.count()
+                user = User.objects.create(username=f'commenter{index}')
+                Comment.objects.create(post=self.post_001, author=user, content=f'댓글 {index}')
+                self.post_001.tags.add(Tag.objects.create(name=f'tag{index}', slug=f'tag{index}'))
+
+        sizes = (1, 10, 30)
+        self.assertQueriesDoNotScale(self.post_001.get_absolute_url(), add_comments, sizes=sizes)
+        self.assertQueriesDoNotScale(f'/blog/{self.post_001.pk}/comments/', add_comments, sizes=sizes)
+
+        # 로그인한 사용자에게는 자기 댓글의 수정, 삭제 버튼이 보인다
+        self.client.login(username='obama', password='somepassword')
+        self.assertQueriesDoNotScale(self.post_001.get_absolute_url(), add_comments, sizes=sizes)
+
+    def test_query_scaling_failure_message(self):
+        # 댓글마다 작성자를 다시 가져오는 N+1을 일부러 만들면 실패하고 반복된 SQL을 보여준다
+        def add_comments(n):
+            for i in range(n):
+                user = User.objects.create(username=f'commenter{Comment.objects.count()}')
+                Comment.objects.create(post=self.post_001, author=user, content='댓글')
+
+        with mock.patch.object(Comment, 'get_avatar_url', lambda comment: User.objects.get(pk=comment.author_id).username):
+            with self.assertRaisesRegex(AssertionError, r'query count grows(.|\n)*x\d+ SELECT'):
+                self.assertQueriesDoNotScale(f'/blog/{self.post_001.pk}/comments/', add_comments)
+
+    def test_hot_query_plans(self):
+        for i in range(3):
+            Comment.objects.create(post=self.post_001, author=self.user_obama, content=f'댓글 {i}')
+        Tag.objects.create(name='python', slug='python').post_set.add(self.post_001)
+        plans = {name: queryset.explain() for name, queryset in get_hot_queries().items()}
+
+        # 카테고리와 미분류 페이지, 댓글은 인덱스 순서대로 읽고 따로 정렬하지 않는다
+        self.assertIn('post_category_recent_idx', plans['category_page'])
+        self.assertIn('post_category_recent_idx', plans['no_category_page'])
+        self.assertIn('comment_post_created_idx', plans['comments'])
+        self.assertNotIn('TEMP B-TREE', plans['comments'])
+        # 태그 이름 조회는 테이블 전체를 읽지 않는다
+        self.assertNotIn('SCAN', plans['tags_by_name'])
+
+    def test_export_and_import_blog(self):
+        tag_python = Tag.objects.create(name='python', slug='python')
+        self.post_001.tags.add(tag_python)
+        Comment.objects.create(post=self.post_001, author=self.user_obama, content='첫 댓글')
+
+        out = StringIO()
+        call_command('export_blog', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(json.loads(lines[0]), {'model': 'blog', 'version': 1})
+        self.assertEqual([json.loads(line)['model'] for line in lines[1:]],
+                         ['user'] * 2 + ['category'] * 2 + ['tag'] + ['post'] * 3 + ['comment'])
+
+        # 다른 사이트에서 만든 데이터처럼 처음 보는 사용자와 태그를 넣는다
+        records = [json.loads(line) for line in lines]
+        records.insert(3, {'model': 'user', 'username': 'biden', 'email': '', 'first_name': '', 'last_name': ''})
+        records.insert(6, {'model': 'tag', 'name': 'rust', 'slug': 'rust'})
+        post_record = next(record for record in records if record['model'] == 'post' and record['pk'] == self.post_001.pk)
+        post_record.update({'author': 'biden', 'tags': ['python', 'rust']})
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = f'{tmp_dir}/blog.ndjson.gz'
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+        # 가져올 pk에 예전 포스트의 조각 캐시 버전이 남아 있어도 가져온 뒤에는 쓰이지 않는다
+        imported_pk = Post.objects.order_by('-pk')[0].pk + self.post_001.pk
+        stale_versions = get_fragment_versions(imported_pk)
+
+        call_command('import_blog', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 6)
+        imported = Post.objects.get(author__username='biden')
+        self.assertEqual(imported.pk, imported_pk)
+        self.assertFalse(set(stale_versions.values()) & set(get_fragment_versions(imported_pk).values()))
+        self.assertEqual(imported.title, self.post_001.title)
+        self.assertEqual(imported.created_at, self.post_001.created_at)
+        self.assertEqual(imported.content_html, self.post_001.content_html)
+        self.assertEqual(sorted(imported.tags.values_list('slug', flat=True)), ['python', 'rust'])
+        self.assertEqual(Tag.objects.filter(slug='python').count(), 1)
+        comment = Comment.objects.get(post=imported)
+        self.assertEqual((comment.author, comment.content), (self.user_obama, '첫 댓글'))
+        self.assertFalse(User.objects.get(username='biden').has_usable_password())
+        self.assertEqual(CategoryPostCount.objects.get(category=self.category_programming).count, 2)
+
+        with self.assertRaises(CommandError):
+            with open(f'{tmp_dir}/bad.ndjson', 'w') as f:
+                f.write('{"model": "blog", "version": 99}\n')
+            call_command('import_blog', f'{tmp_dir}/bad.ndjson', stdout=StringIO())
+
+
+# 마이그레이션은 스키마를 바꾸므로 트랜잭션으로 감싸지 않는 TransactionTestCase에서 테스트한다
+class TestMigrations(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state(target).apps
+
+    def test_merge_duplicate_tags(self):
+        apps = self.migrate(('blog_app', '0020_upload_storage'))
+        Tag = apps.get_model('blog_app', 'Tag')
+        Post = apps.get_model('blog_app', 'Post')
+        first, second, third = [Tag.objects.create(name='python', slug=f'python-{i}') for i in range(3)]
+        # 남길 태그(first)에는 연결되지 않고 나머지 두 태그에 모두 연결된 포스트
+        both = Post.objects.create(title='둘 다', content='...')
+        both.tags.add(second, third)
+        kept = Post.objects.create(title='모두', content='...')
+        kept.tags.add(first, second, third)
+        single = Post.objects.create(title='하나', content='...')
+        single.tags.add(third)
+
+        apps = self.migrate(('blog_app', '0021_hot_query_indexes'))
+        Tag = apps.get_model('blog_app', 'Tag')
+        through = apps.get_model('blog_app', 'Post').tags.through
+        self.assertEqual(list(Tag.objects.values_list('pk', flat=True)), [first.pk])
+        for post in (both, kept, single):
+            self.assertEqual(list(through.objects.filter(post_id=post.pk).values_list('tag_id', flat=True)), [first.pk])
@@ -1,17 +1,37 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from .page_cache import anonymous_page_cache
+
+# settings.BLOG_ASYNC_VIEWS가 True이면 목록, 상세, 검색 페이지는 비동기 뷰(async_views.py)를 사용한다
+if settings.BLOG_ASYNC_VIEWS:
+    from . import async_views
+    post_list = async_views.post_list
+    post_detail = async_views.post_detail
+    category_page = async_views.category_page
+    tag_page = async_views.tag_page
+    post_search = async_views.post_search
+else:
+    post_list = views.PostList.as_view()
+    post_detail = views.PostDetail.as_view()
+    category_page = views.category_page
+    tag_page = views.tag_page
+    post_search = views.PostSearch.as_view()
 
 urlpatterns = [
-    path('/', views.PostList.as_view()),
-    path('/<int:pk>/', views.PostDetail.as_view()),
-    path('/category/<str:slug>/',views.category_page),
-    path('/tag/<str:slug>/', views.tag_page),
+    path('/', anonymous_page_cache(post_list)),
+    path('/<int:pk>/', anonymous_page_cache(post_detail, query_params=())),
+    path('/category/<str:slug>/',anonymous_page_cache(category_page)),
+    path('/tag/<str:slug>/', anonymous_page_cache(tag_page)),
     path('/create_post/', views.PostCreate.as_view()),
     path('/update_post/<int:pk>/', views.PostUpdate.as_view()),
     path('/<int:pk>/new_comment/', views.new_comment),
+    path('/<int:pk>/comments/', anonymous_page_cache(views.comment_list)),
+    path('/<int:pk>/download/', views.download_file),
+    path('/<int:pk>/head_image/', views.download_head_image),
     path('/update_comment/<int:pk>/', views.CommentUpdate.as_view()),
     path('/delete_comment/<int:pk>/', views.delete_comment),
-    path('/search/<str:q>/', views.PostSearch.as_view()),
+    path('/search/<str:q>/', anonymous_page_cache(post_search)),
     # path('/', views.index),
     # path('/<int:pk>/', views.single_post_page),
 ]
\ No newline at end of file
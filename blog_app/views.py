@@ -5,10 +5,16 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Post, Category, Tag, Comment
 # 권한에 따른 처리, 만약에 권한이 없는데 접근하면 403 오류 메시지 출력
 from django.core.exceptions import PermissionDenied
-from django.utils.text import slugify
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
 from .forms import CommentForm
+from .pagination import KeysetPaginator, SequencePaginator
+from .search import search_posts, get_hit_count_label
+from .services import set_post_tags
+from .fragments import FRAGMENT_TIMEOUT, get_fragment_versions
+from .downloads import serve_file
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.http import Http404
 
 # Create your views here.
 
@@ -20,23 +26,71 @@ class PostList(ListView):
     # 한페이지에 보여질 post 수
     paginate_by = 5
 
-    def get_context_data(self, **kwargs):
-        context = super(PostList, self).get_context_data()
-        context['categories'] = Category.objects.all()
-        context['no_category_post_count'] = Post.objects.filter(category=None).count()
-        return context
+    def get_queryset(self):
+        return super(PostList, self).get_queryset().for_listing()
+
+    # ?page=N(OFFSET) 대신 ?cursor= 로 다음/이전 페이지를 가져온다, blog_app/pagination.py
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=(self.ordering,))
+        page = paginator.get_page(self.request.GET.get(paginator.cursor_param))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+# category_page, tag_page 처럼 함수형 뷰에서 PostList와 같은 방법으로 페이지를 나눈다
+def paginate_post_list(request, post_list):
+    paginator = KeysetPaginator(post_list, PostList.paginate_by, ordering=(PostList.ordering,))
+    page = paginator.get_page(request.GET.get(paginator.cursor_param))
+    return {
+        'post_list' : page.object_list,
+        'page_obj' : page,
+        'is_paginated' : page.has_other_pages(),
+    }
 
 class PostDetail(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
 
+    def get_queryset(self):
+        return super(PostDetail, self).get_queryset().select_related('author', 'category')
+
     def get_context_data(self, **kwargs):
         context = super(PostDetail, self).get_context_data()
-        context['categories'] = Category.objects.all()
-        context['no_category_post_count'] = Post.objects.filter(category=None).count()
         context['comment_form'] = CommentForm
+        # 본문, 태그, 댓글 조각 캐시의 키에 들어갈 버전, fragments.py
+        context['fragment_timeout'] = FRAGMENT_TIMEOUT
+        context['fragment_versions'] = get_fragment_versions(self.object.pk)
+        # 첫 페이지의 댓글만 보여주고 나머지는 comment_list 뷰로 가져온다
+        # 댓글 조각의 캐시 키에 커서가 없으므로 ?cursor= 가 있어도 항상 첫 페이지를 보여준다
+        # 댓글 조각이 캐시되어 있으면 댓글 쿼리를 하지 않도록 템플릿에서 처음 쓸 때 가져온다
+        context['comment_page'] = SimpleLazyObject(
+            lambda: paginate_comments(self.request, self.object, first_page=True)['comment_page']
+        )
         return context
 
+# 한 번에 보여줄 댓글 수
+COMMENTS_PER_PAGE = 20
+
+# 댓글을 작성 순서(created_at, pk)로 커서 페이지네이션
+# 작성자와 아바타를 미리 불러와서 댓글 수와 상관없이 쿼리 수가 일정하다
+# first_page=True이면 요청의 커서를 무시하고 첫 페이지를 가져온다(포스트 상세 페이지)
+def paginate_comments(request, post, first_page=False):
+    comments = Comment.objects.filter(post=post).with_author_avatars()
+    paginator = KeysetPaginator(comments, COMMENTS_PER_PAGE, ordering=('created_at', 'pk'))
+    page = paginator.get_page(None if first_page else request.GET.get(paginator.cursor_param))
+    return {
+        'comment_page' : page,
+    }
+
+# 포스트 상세 페이지의 '댓글 더 보기'에서 다음 페이지의 댓글 html 조각만 가져온다
+def comment_list(request, pk):
+    post = get_object_or_404(Post.objects.only('pk'), pk=pk)
+    context = paginate_comments(request, post)
+    context['post'] = post
+    return render(
+        request,
+        'blog/comment_list.html',
+        context,
+    )
+
 class PostCreate(LoginRequiredMixin ,CreateView):
     model = Post
     template_name = 'blog/post_form.html'
@@ -50,44 +104,18 @@ class PostCreate(LoginRequiredMixin ,CreateView):
         if current_user.is_authenticated:
             form.instance.author = current_user
             # 태그와 관련된 작업을 하기 전에 createview의 form_validate()함수의 결과값을 response라는 변수에 임시 저장
-            response = super(PostCreate, self).form_valid(form)
-
-            # 장고가 자동으로 작성한 post_form.html의 폼을 보면 method="post"로 솔종ㄷ하오 있다
-            # 아 폼 안에 name= 'tags_str'인 inputㄱ을 추가했으니 방문자가 <submit> 버튼을 클릭했을 때 이 값 역시 Post방식으로 postCrete까지 전달돤 상태
-            # 이 값은 self.request.Post.get('tags_str')로 받을 수 있다
-            # post 방식으로 전달된 정보 중 name='tags_str'인 input의 값을 가져오라는뜻
-            tags_str = self.request.POST.get('tags_str')
-            # 이 값이 빈 칸인 경우에는 태그와 관련된 어떤 동작도 할 필요가 없습니다
-            # 따라서 if문으로 tag_str을 처리해야 할지 판단해야 합니다
-            # tag_str이 존재한다면 여러 개의 태그가 들어오더라도 처리할 수있어야 하고, 세미콜론과 쉼표 모두 구분자로 처리되어야 합니다
-            # tags_str로 받은 값의 쉼표를 세미콜론으로 모두 변경한 후 세미콜론으로 split해서 리스트 형태로 tags_list에 담는다
-            if tags_str:
-                tags_str = tags_str.strip()
-
-
-                tags_str = tags_str.replace(',',';')
-                tags_list = tags_str.split(';')
-
-                for t in tags_list:
-                    # tags_list에 리스트 형태로 담겨 있는 값은 문자열 형태이므로 tag 모델의 인스턴스로 변환하는 과정이 필요하다
-                    # 일단 문자열 앞뒤로 공백이 있을 ㅜㅅ 있으므로 strip()으로으로 앞뒤의 공백을 제거
-                    t = t.strip()
-                    # 이 값을 name으로 갖는 태그가 있다면 가져오고, 없다면 새로 만듭니다
-                    # get_or_create()는 두가지 값을 동시에 return 합니다
-                    # 첫번째는 tag 모델의 인스턴스이고, 두번째는 이 인스턴스가 새로 생성되었는지를 나타내는ㄴ bool 형태의 값입니다
-                    tag, is_tag_created = Tag.objects.get_or_create(name=t)
-                    # 만약 같은 name을 갖는 태그가 없어 새로 생성했다면 아직 slug 값은 없는 상태이므로 slug 값을 생성해야 한다
-                    # 관리자가 페이지에서 작업할 때는 자도으로 생성해줬지만 이번에는 get_or_create()메서드로 생성했기 때문에 발생하는 문제다
-                    # 이런 경우에 대비하기 위해 장고는 slugfy()라는 함수를 제공한다
-                    # 한글 태그가 입력되더라고 slugㄹ를 만들수 있도록 alliw_unicode=true로 설정
-                    # 이 값을 태그ㅡ이 slug에 부여되고 저장하면 name과 slug필드를 모두 채운 상태로 저장된다
-                    # slugfy()를 쓰려면 당연히 views.py파일의 상단에 import해줘야 한다
-                    if is_tag_created:
-                        tag.slug = slugify(t, allow_unicode=True)
-                        tag.save()
-                    # 새로 태그를 만들었든, 기존에 존쟇ㅏ던 태그를 가져왔든 새로 만든 포스트의 tags필드에 추가해야 한다
-                    #이때 self.object는 이번에 새로 만든 포스트를 의미
-                    self.object.tags.add(tag)
+            # 포스트 저장과 태그 저장은 하나의 트랜잭션으로 묶는다
+            with transaction.atomic():
+                response = super(PostCreate, self).form_valid(form)
+
+                # 장고가 자동으로 작성한 post_form.html의 폼을 보면 method="post"로 솔종ㄷ하오 있다
+                # 아 폼 안에 name= 'tags_str'인 inputㄱ을 추가했으니 방문자가 <submit> 버튼을 클릭했을 때 이 값 역시 Post방식으로 postCrete까지 전달돤 상태
+                # 이 값은 self.request.Post.get('tags_str')로 받을 수 있다
+                # post 방식으로 전달된 정보 중 name='tags_str'인 input의 값을 가져오라는뜻
+                tags_str = self.request.POST.get('tags_str')
+                # 세미콜론과 쉼표로 구분된 태그를 한 번에 처리, 없는 태그는 slug와 함께 만들어서 포스트에 추가한다
+                # 태그가 여러 개여도 쿼리 수가 일정하도록 services.py의 set_post_tags()에서 한꺼번에 처리
+                set_post_tags(self.object, tags_str)
             # 원하는 작업이 다 끝나면 새로 만든 포스트의 페이지로 이동해야 하므로 resoponse변수에 담아놓았던 CreateviewDml formvalida()의 결과값을 reutnr
             return response
         else :
@@ -95,7 +123,8 @@ class PostCreate(LoginRequiredMixin ,CreateView):
 
 class PostUpdate(LoginRequiredMixin, UpdateView):
     model = Post
-    fields = ['title', 'hook_text', 'content', 'head_image', 'file_upload', 'category', 'tags']
+    # 태그는 tags_str 입력으로만 수정한다
+    fields = ['title', 'hook_text', 'content', 'head_image', 'file_upload', 'category']
     template_name = 'blog/post_update_form.html'
 
     def get_context_data(self, **kwargs):
@@ -108,22 +137,10 @@ class PostUpdate(LoginRequiredMixin, UpdateView):
         return context
 
     def form_valid(self,form):
-        response = super(PostUpdate, self).form_valid(form)
-        self.object.tags.clear()
-
-        tags_str = self.request.POST.get('tags_str')
-        if tags_str:
-            tags_str = tags_str.strip()
-            tags_str = tags_str.replace(',', ';')
-            tags_list = tags_str.split(';')
-
-            for t in tags_list:
-                t = t.strip()
-                tag, is_tag_created = Tag.objects.get_or_create(name=t)
-                if is_tag_created:
-                    tag.slug = slugify(t, allow_unicode=True)
-                    tag.save()
-                self.object.tags.add(tag)
+        # tags_str에 적힌 태그로 맞추되 바뀐 태그만 추가/삭제한다, services.py
+        with transaction.atomic():
+            response = super(PostUpdate, self).form_valid(form)
+            set_post_tags(self.object, self.request.POST.get('tags_str'))
         return response
 
     def dispatch(self, request, *args, **kwargs):
@@ -139,35 +156,29 @@ class PostUpdate(LoginRequiredMixin, UpdateView):
 def category_page(request, slug):
         if slug == 'no_category' :
             category = '미분류'
-            post_list = Post.objects.filter(category=None)
+            post_list = Post.objects.for_listing().filter(category=None)
         else :
             category = Category.objects.get(slug=slug)
-            post_list = Post.objects.filter(category=category)
+            post_list = Post.objects.for_listing().filter(category=category)
 
+        context = paginate_post_list(request, post_list)
+        context['category'] = category
         return render(
             request,
             'blog/post_list.html',
-            {
-                'post_list' : post_list,
-                'categories' : Category.objects.all(),
-                'no_category_post_count' : Post.objects.filter(category=None).count(),
-                'category' : category,
-            }
+            context,
         )
 
 def tag_page(request, slug):
     tag = Tag.objects.get(slug=slug)
-    post_list = tag.post_set.all()
+    post_list = tag.post_set.for_listing()
 
+    context = paginate_post_list(request, post_list)
+    context['tag'] = tag
     return render(
         request,
         'blog/post_list.html',
-        {
-            'post_list' : post_list,
-            'tag' : tag,
-            'categories' : Category.objects.all(),
-            'no_categoru_post_count' : Post.objects.filter(category=None).count(),
-        }
+        context,
     )
 
 def new_comment(request, pk):
@@ -223,23 +234,58 @@ def delete_comment(request, pk):
     else :
         raise PermissionDenied
 
+# 검색 결과 한 페이지의 SearchHit 리스트로 포스트를 순위대로 가져온다
+# 각 포스트의 search_snippet에는 검색어를 <mark>로 강조한 본문 일부가 들어있다
+def get_search_posts(hits):
+    posts = Post.objects.for_listing().in_bulk([hit.pk for hit in hits])
+    post_list = []
+    for hit in hits:
+        post = posts.get(hit.pk)
+        if post is not None:
+            post.search_snippet = hit.snippet
+            post_list.append(post)
+    return post_list
+
 class PostSearch(PostList):
-    paginate_by = None
+    # get_queryset()이 쿼리셋이 아니라 리스트를 return 하므로 템플릿에서 쓸 이름을 직접 지정
+    context_object_name = 'post_list'
 
+    # 검색 인덱스에서 순위대로 찾은 SearchHit 리스트, 같은 검색어는 잠시 캐시된다, blog_app/search
     def get_queryset(self):
-        q = self.kwargs['q']
-        post_list = Post.objects.filter(
-            Q(title__contains=q) | Q(tags__name__contains=q)
-        ).distinct()
-        return post_list
+        return search_posts(self.kwargs['q'])
+
+    # PostList처럼 ?cursor= 로 페이지를 나누고, 현재 페이지의 포스트만 DB에서 가져온다
+    def paginate_queryset(self, hits, page_size):
+        paginator = SequencePaginator(hits, page_size)
+        page = paginator.get_page(self.request.GET.get(paginator.cursor_param))
+        page.object_list = self.get_posts(page.object_list)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_posts(self, hits):
+        return get_search_posts(hits)
 
     def get_context_data(self, **kwargs):
         context = super(PostSearch, self).get_context_data()
         q = self.kwargs['q']
-        context['search_info'] = f'Search: {q} ({self.get_queryset().count()})'
+        # 검색 결과 수는 get_queryset()에서 가져온 리스트의 길이, 다시 검색하지 않는다(SEARCH_LIMIT개 이상이면 '1000+')
+        context['search_info'] = f'Search: {q} ({get_hit_count_label(self.object_list)})'
 
         return context
 
+# 첨부 파일 다운로드, Range(이어받기)와 ETag를 지원한다, blog_app/downloads.py
+def download_file(request, pk):
+    post = get_object_or_404(Post.objects.only('pk', 'file_upload', 'file_upload_sha256'), pk=pk)
+    if not post.file_upload:
+        raise Http404('첨부 파일이 없습니다')
+    return serve_file(request, post.file_upload, as_attachment=True, sha256=post.file_upload_sha256)
+
+
+def download_head_image(request, pk):
+    post = get_object_or_404(Post.objects.only('pk', 'head_image'), pk=pk)
+    if not post.head_image:
+        raise Http404('이미지가 없습니다')
+    return serve_file(request, post.head_image)
+
 # FBV
 # def index(request):
 #     posts = Post.objects.all().order_by('-pk')
@@ -261,4 +307,4 @@ class PostSearch(PostList):
 #         {
 #             'post' : post,
 #         }
-#     )    
\ No newline at end of file
+#     )    
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from blog_app.page_cache import anonymous_page_cache
+
+landing = views.landing_async if settings.BLOG_ASYNC_VIEWS else views.landing
 
 urlpatterns = [
-    path('about_me/', views.about_me),
-    path('',views.landing),
+    path('about_me/', anonymous_page_cache(views.about_me, query_params=())),
+    path('',anonymous_page_cache(landing, query_params=())),
 ]
\ No newline at end of file
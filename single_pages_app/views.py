@@ -1,10 +1,11 @@
 from django.shortcuts import render
 from blog_app.models import Post
+from blog_app.async_views import run_queries, load_user, render_async
 
 # Create your views here.
 
 def landing(request):
-    recent_posts = Post.objects.order_by('-pk')[:3]
+    recent_posts = Post.objects.with_author_avatars().order_by('-pk')[:3]
     return render(
         request,
         'single_pages/landing.html',
@@ -13,6 +14,20 @@ def landing(request):
         }
     )
 
+# settings.BLOG_ASYNC_VIEWS = True 일 때 사용하는 비동기 뷰, blog_app/async_views.py
+async def landing_async(request):
+    recent_posts, _ = await run_queries(
+        lambda: list(Post.objects.with_author_avatars().order_by('-pk')[:3]),
+        lambda: load_user(request),
+    )
+    return await render_async(
+        request,
+        'single_pages/landing.html',
+        {
+            'recent_posts' : recent_posts,
+        }
+    )
+
 def about_me(request):
     return render(
         request,